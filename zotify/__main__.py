@@ -94,6 +94,12 @@ def main():
     group.add_argument('--gui',
                        action='store_true',
                        help='Launch the Zotify GUI')
+    group.add_argument('--bench',
+                       type=int,
+                       nargs='?',
+                       const=20,
+                       metavar='TRACKS',
+                       help='Benchmark the download pipeline offline against a local fake backend, using an album, a playlist and TRACKS single tracks (default 20)')
     
     for flag in DEPRECIATED_FLAGS: 
         group.add_argument(*flag["flags"],
@@ -124,6 +130,11 @@ def main():
         main.main()
         return
 
+    if args.bench is not None:
+        from zotify.bench import run_bench
+        run_bench(args)
+        return
+    
     try:
         args.func(args)
     except KeyboardInterrupt:
@@ -1,8 +1,8 @@
 from typing import Optional
-from zotify.config import Zotify
+from zotify.config import Zotify, PagedItems
 from zotify.const import ALBUM_URL, ARTIST_URL, ITEMS, ARTISTS, NAME, ID, DISC_NUMBER, ALBUM_TYPE, COMPILATION, AVAIL_MARKETS
 from zotify.termoutput import Printer, PrintChannel, Loader
-from zotify.track import download_track
+from zotify.track import download_track, prefetch_track_resps
 from zotify.utils import fix_filename
 
 
@@ -22,14 +22,12 @@ def get_album_info(album_id: str) -> tuple[str, str, list[dict], int, bool]:
     return album_name, album_artists, tracks, total_discs, compilation
 
 
-def get_artist_album_ids(artist_id):
-    """ Returns artist's albums """
+def get_artist_album_ids(artist_id) -> PagedItems:
+    """ Returns artist's album IDs, fetched page by page as they are iterated """
     with Loader(PrintChannel.PROGRESS_INFO, "Fetching artist information..."):
         # excludes "appears_on" and "compilations"
         url = f'{ARTIST_URL}/{artist_id}/albums?include_groups=album%2Csingle'
-        simple_albums = Zotify.invoke_url_nextable(url, ITEMS)
-    
-    return [album[ID] for album in simple_albums]
+        return Zotify.invoke_url_paged(url, ITEMS, transform=lambda album: album[ID])
 
 
 def download_artist_albums(progress_emitter, artist, pbar_stack: Optional[list] = None):
@@ -66,6 +64,8 @@ def download_album(progress_emitter, album_id: str, pbar_stack: Optional[list] =
                                                    (f'Regex Groups: {regex_match.groupdict()}\n' if regex_match.groups() else ""))
             return False
     
+    track_resps = prefetch_track_resps([track[ID] for track in tracks])
+    
     pos, pbar_stack = Printer.pbar_position_handler(3, pbar_stack)
     pbar = Printer.pbar(tracks, unit='song', pos=pos, 
                         disable=not Zotify.CONFIG.get_show_album_pbar())
@@ -84,7 +84,8 @@ def download_album(progress_emitter, album_id: str, pbar_stack: Optional[list] =
         
         download_track(progress_emitter, 'album', track[ID],
                        extra_keys,
-                       pbar_stack)
+                       pbar_stack,
+                       track_resps.get(track[ID]))
         pbar.set_description(track[NAME])
         Printer.refresh_all_pbars(pbar_stack)
         if progress_emitter:
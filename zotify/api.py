@@ -28,42 +28,185 @@ def get_liked_songs():
 
     return Zotify.invoke_url_nextable(USER_SAVED_TRACKS_URL, ITEMS)
 
-def get_local_songs(path):
+def strip_markets(item):
     """
-    Scans a directory for local music files and reads their metadata.
+    Drops the available_markets lists, most of the size of a saved item, before it is cached.
+    """
+    for content in (item.get('track'), item.get('episode')):
+        if content:
+            content.pop('available_markets', None)
+            if isinstance(content.get('album'), dict):
+                content['album'].pop('available_markets', None)
+    return item
+
+def liked_song_key(item):
+    track = item.get('track') or {}
+    return track.get('id') or f"added:{item.get('added_at')}"
+
+def get_cached_liked_songs():
+    """
+    Returns the current user's liked songs as of the last sync, newest first.
+    """
+    from zotify.cache import UserLibraryCache
+    
+    if not Zotify.SESSION:
+        raise Exception("Not logged in.")
+    
+    return UserLibraryCache.liked_songs(Zotify.SESSION.username())
+
+def sync_liked_songs(known):
+    """
+    Brings the cached liked songs up to date and returns them newest first, or None if nothing changed.
+    Pages are fetched from the newest song until a known one is reached and the new songs are merged,
+    a re-liked song replacing its older entry. If the merged count then disagrees with the total,
+    songs were unliked and the full list is fetched again.
+    """
+    from zotify.const import USER_SAVED_TRACKS_URL, ITEMS
+    from zotify.cache import UserLibraryCache
+    
+    if not Zotify.SESSION:
+        raise Exception("Not logged in.")
+    
+    user = Zotify.SESSION.username()
+    known_items = {(liked_song_key(item), item.get('added_at')) for item in known}
+    new_items = []
+    offset = 0
+    while True:
+        resp = Zotify.invoke_url_with_params(USER_SAVED_TRACKS_URL, limit=50, offset=offset)
+        page = resp[ITEMS]
+        reached_known = False
+        for item in page:
+            if (liked_song_key(item), item.get('added_at')) in known_items:
+                reached_known = True
+                break
+            new_items.append(strip_markets(item))
+        if reached_known or not page or resp.get('next') is None:
+            break
+        offset += len(page)
+    
+    new_keys = {liked_song_key(item) for item in new_items}
+    songs = new_items + [item for item in known if liked_song_key(item) not in new_keys]
+    if resp.get('total') is not None and len(songs) != resp['total']:
+        songs = [strip_markets(item) for item in Zotify.invoke_url_nextable(USER_SAVED_TRACKS_URL, ITEMS)]
+        UserLibraryCache.store_liked_songs(user, [(liked_song_key(item), item) for item in reversed(songs)], replace=True)
+        return songs
+    if not new_items:
+        return None
+    UserLibraryCache.store_liked_songs(user, [(liked_song_key(item), item) for item in reversed(new_items)])
+    return songs
+
+def read_local_tags(file_path):
+    """
+    Reads the text tags of a local music file, returns (size, mtime_ns, {name, artists, album})
+    or None if it is not a recognised audio file.
     """
-    from zotify.utils import walk_directory_for_tracks
     from mutagen import File
+    
+    st = file_path.stat()
+    audio = File(file_path, easy=True)
+    if audio is None:
+        return None
+    return st.st_size, st.st_mtime_ns, {
+        'name': audio.get('title', [str(file_path.name)])[0],
+        'artists': audio.get('artist', ['Unknown Artist']),  # Keep as list of strings
+        'album': audio.get('album', ['Unknown Album'])[0],  # Keep as string
+    }
 
-    songs = []
-    for file_path in walk_directory_for_tracks(path):
+def local_song_info(file_path, tags, indexed_ids):
+    return {
+        'type': 'local_track',  # Add type
+        **tags,
+        'path': str(file_path),
+        'id': indexed_ids.get(file_path),
+    }
+
+def get_local_songs(path):
+    """
+    Scans a directory for local music files and reads their metadata.
+    Only files that are new or changed since the last scan are opened (see LocalTrackCache),
+    and those are read in parallel.
+    """
+    from zotify.utils import walk_directory_for_tracks, read_files_bulk
+    from zotify.archive import LibraryIndex
+    from zotify.cache import LocalTrackCache
+    
+    # track ids of files downloaded by zotify, from the library-wide index
+    indexed_ids = {}
+    if not Zotify.CONFIG.get_disable_directory_archives():
+        indexed_ids = LibraryIndex.track_ids_by_path()
+    
+    cached = LocalTrackCache.entries(path)
+    found = {}
+    changed = []
+    for file_path in sorted(walk_directory_for_tracks(path)):
+        entry = cached.pop(str(file_path), None)
         try:
-            audio = File(file_path, easy=True)
-            if audio is None:
-                continue
-
-            # Also get the full tag info to look for album art
-            full_audio = File(file_path)
-            artwork = None
-            if full_audio:
-                if 'APIC:' in full_audio:
-                    artwork = full_audio['APIC:'].data
-                elif 'covr' in full_audio:  # for mp4/m4a
-                    artwork = full_audio['covr'][0]
-
-            song_info = {
-                'type': 'local_track',  # Add type
-                'name': audio.get('title', [str(file_path.name)])[0],
-                'artists': audio.get('artist', ['Unknown Artist']),  # Keep as list of strings
-                'album': audio.get('album', ['Unknown Album'])[0],  # Keep as string
-                'path': str(file_path),
-                'image_data': artwork  # Add image data
-            }
-            songs.append(song_info)
-        except Exception as e:
+            st = file_path.stat()
+        except OSError as e:
             print(f"Error reading metadata for {file_path}: {e}")
+            continue
+        if entry is not None and entry[:2] == (st.st_size, st.st_mtime_ns):
+            found[file_path] = entry[2]
+        else:
+            found[file_path] = None
+            changed.append(file_path)
+
+    fresh = []
+    for file_path, result in read_files_bulk(changed, read_local_tags):
+        if isinstance(result, Exception):
+            print(f"Error reading metadata for {file_path}: {result}")
+        elif result is not None:
+            found[file_path] = result[2]
+            fresh.append((str(file_path), *result))
+    
+    songs = [local_song_info(file_path, tags, indexed_ids) for file_path, tags in found.items() if tags is not None]
+    
+    # whatever is left in cached was not found on disk anymore
+    LocalTrackCache.update(fresh, list(cached))
     return songs
 
+def apply_local_changes(changes):
+    """
+    Applies (event, path) batches from a LibraryWatcher to the scan cache. Returns the song info of
+    added or modified files and the paths to drop from the view.
+    """
+    from zotify.archive import LibraryIndex
+    from zotify.cache import LocalTrackCache
+    from zotify.utils import read_files_bulk
+    from zotify.watcher import REMOVED
+    
+    indexed_ids = {}
+    if not Zotify.CONFIG.get_disable_directory_archives():
+        indexed_ids = LibraryIndex.track_ids_by_path()
+    
+    removed = [str(path) for event, path in changes if event == REMOVED]
+    songs = []
+    fresh = []
+    for file_path, result in read_files_bulk([path for event, path in changes if event != REMOVED], read_local_tags):
+        if isinstance(result, Exception) or result is None:
+            # vanished again or not readable audio, drop it from the view
+            removed.append(str(file_path))
+        else:
+            songs.append(local_song_info(file_path, result[2], indexed_ids))
+            fresh.append((str(file_path), *result))
+    
+    LocalTrackCache.update(fresh, removed)
+    return songs, removed
+
+def get_local_artwork(path):
+    """
+    Reads the embedded cover art of a local music file, returns None if it has none.
+    """
+    from mutagen import File
+    
+    audio = File(path)
+    if audio:
+        if 'APIC:' in audio:
+            return audio['APIC:'].data
+        elif 'covr' in audio:  # for mp4/m4a
+            return bytes(audio['covr'][0])
+    return None
+
 def get_user_playlists(limit=50, offset=0):
     """
     Retrieves the current user's playlists.
@@ -72,3 +215,44 @@ def get_user_playlists(limit=50, offset=0):
         raise Exception("Not logged in.")
 
     return Zotify.invoke_url_nextable(USER_PLAYLISTS_URL, ITEMS, limit)
+
+def get_cached_user_playlists():
+    """
+    Returns the current user's playlists as of the last sync.
+    """
+    from zotify.cache import UserLibraryCache
+    
+    if not Zotify.SESSION:
+        raise Exception("Not logged in.")
+    
+    return UserLibraryCache.playlists(Zotify.SESSION.username())
+
+def sync_user_playlists(known):
+    """
+    Fetches the current user's playlists and caches them, returns None if none was added, removed or
+    changed (a changed playlist has a new snapshot_id).
+    """
+    from zotify.cache import UserLibraryCache
+    
+    playlists = [playlist for playlist in get_user_playlists() if playlist]
+    if playlists == known:
+        return None
+    UserLibraryCache.store_playlists(Zotify.SESSION.username(), playlists)
+    return playlists
+
+def get_playlist_items(playlist_id, snapshot_id=None):
+    """
+    Returns the full items of a playlist, from the cache as long as its snapshot_id is unchanged.
+    """
+    from zotify.playlist import get_playlist_full_items
+    from zotify.cache import UserLibraryCache
+    
+    if snapshot_id:
+        items = UserLibraryCache.playlist_items(playlist_id, snapshot_id)
+        if items is not None:
+            return items
+    
+    items = [strip_markets(item) for item in get_playlist_full_items(playlist_id)]
+    if snapshot_id:
+        UserLibraryCache.store_playlist_items(playlist_id, snapshot_id, items)
+    return items
@@ -1,16 +1,18 @@
 from argparse import Namespace
 from librespot.audio.decoders import AudioQuality
-from pathlib import Path, PurePath
+from pathlib import Path
 
 from zotify.album import download_album, download_artist_albums
+from zotify.cache import DirectoryCache
 from zotify.config import Zotify
 from zotify.const import TRACK, NAME, ID, ARTIST, ARTISTS, ITEMS, TRACKS, EXPLICIT, ALBUM, ALBUMS, OWNER, \
-    PLAYLIST, PLAYLISTS, DISPLAY_NAME, USER_FOLLOWED_ARTISTS_URL, USER_SAVED_TRACKS_URL, SEARCH_URL, TRACK_BULK_URL
+    PLAYLIST, PLAYLISTS, DISPLAY_NAME, USER_FOLLOWED_ARTISTS_URL, USER_SAVED_TRACKS_URL, SEARCH_URL
 from zotify.playlist import get_playlist_info, download_from_user_playlist, download_playlist
 from zotify.podcast import download_episode, download_show
+from zotify.postprocess import PostProcessor
 from zotify.termoutput import Printer, PrintChannel
-from zotify.track import download_track, update_track_metadata
-from zotify.utils import split_sanitize_intrange, regex_input_for_urls, walk_directory_for_tracks, get_archived_entries
+from zotify.track import download_track, verify_library, prefetch_track_resps
+from zotify.utils import split_sanitize_intrange, regex_input_for_urls
 
 
 def download_from_urls(urls: list[str]) -> int:
@@ -31,11 +33,12 @@ def download_from_urls(urls: list[str]) -> int:
         
         track_id, album_id, playlist_id, episode_id, show_id, artist_id = result
         if track_id is not None:
-            download_track('single', track_id, None, pbar_stack)
+            download_track(None, 'single', track_id, None, pbar_stack)
         elif album_id is not None:
-            download_album(album_id, pbar_stack)
+            download_album(None, album_id, pbar_stack)
         elif playlist_id is not None:
-            download_playlist({ID: playlist_id,
+            download_playlist(None,
+                              {ID: playlist_id,
                                NAME: get_playlist_info(playlist_id)[0]},
                                pbar_stack)
         elif episode_id is not None:
@@ -43,7 +46,7 @@ def download_from_urls(urls: list[str]) -> int:
         elif show_id is not None:
             download_show(show_id, pbar_stack)
         elif artist_id is not None:
-            download_artist_albums(artist_id, pbar_stack)
+            download_artist_albums(None, artist_id, pbar_stack)
         
         download += 1 
         Printer.refresh_all_pbars(pbar_stack)
@@ -213,13 +216,13 @@ def search(search_term) -> None:
         
         selection = search_results[choice - 1]
         if selection['type'] == TRACK:
-            download_track('single', selection[ID], None, pbar_stack)
+            download_track(None, 'single', selection[ID], None, pbar_stack)
         elif selection['type'] == ALBUM:
-            download_album(selection[ID], pbar_stack)
+            download_album(None, selection[ID], pbar_stack)
         elif selection['type'] == ARTIST:
-            download_artist_albums(selection[ID], pbar_stack)
+            download_artist_albums(None, selection[ID], pbar_stack)
         else:
-            download_playlist(selection, pbar_stack)
+            download_playlist(None, selection, pbar_stack)
         Printer.refresh_all_pbars(pbar_stack)
 
 
@@ -257,22 +260,30 @@ def client(args: Namespace) -> None:
             download_from_urls(args.urls)
     
     elif args.playlist:
-        download_from_user_playlist()
+        download_from_user_playlist(None)
     
     elif args.liked_songs:
         
-        liked_songs = Zotify.invoke_url_nextable(USER_SAVED_TRACKS_URL, ITEMS)
+        # downloads start after the first page, the next one is fetched while it is processed
+        liked_songs = Zotify.invoke_url_paged(USER_SAVED_TRACKS_URL, ITEMS)
+        
+        def with_track_resps():
+            for page in liked_songs.pages():
+                track_resps = prefetch_track_resps([song[TRACK][ID] for song in page])
+                for song in page:
+                    yield song, track_resps.get(song[TRACK][ID])
+        
         pos = 3
-        pbar = Printer.pbar(liked_songs, unit='song', pos=pos, 
+        pbar = Printer.pbar(with_track_resps(), total=len(liked_songs), unit='song', pos=pos, 
                             disable=not Zotify.CONFIG.get_show_playlist_pbar())
         pbar_stack = [pbar]
         
-        for song in pbar:
+        for song, track_resp in pbar:
             if not song[TRACK][NAME] or not song[TRACK][ID]:
                 Printer.hashtaged(PrintChannel.SKIPPING, 'SONG NO LONGER EXISTS\n' +\
                                                         f'Track_Name: {song[TRACK][NAME]} - Track_ID: {song[TRACK][ID]}')
             else:
-                download_track('liked', song[TRACK][ID], None, pbar_stack)
+                download_track(None, 'liked', song[TRACK][ID], None, pbar_stack, track_resp)
                 pbar.set_description(song[TRACK][NAME])
                 Printer.refresh_all_pbars(pbar_stack)
     
@@ -284,7 +295,7 @@ def client(args: Namespace) -> None:
         pbar_stack = [pbar]
         
         for artist in pbar:
-            download_artist_albums(artist[ID], pbar_stack)
+            download_artist_albums(None, artist[ID], pbar_stack)
             pbar.set_description(artist[NAME])
             Printer.refresh_all_pbars(pbar_stack)
     
@@ -300,27 +311,14 @@ def client(args: Namespace) -> None:
                 search(args.search)
     
     elif args.verify_library:
-        # ONLY WORKS WITH ARCHIVED TRACKS (THEORETICALLY GUARANTEES BULK_URL TO WORK)
-        archived_tracks = get_archived_entries()
-        archived_ids = [entry.strip().split('\t')[0] for entry in archived_tracks]
-        archived_filenames = [PurePath(entry.strip().split('\t')[4]).stem for entry in archived_tracks]
-        
-        track_paths: list[Path] = []; track_ids: list[str] = []
-        library = walk_directory_for_tracks(Zotify.CONFIG.get_root_path())
-        for entry in library:
-            if entry.stem in archived_filenames:
-                track_paths.append(entry)
-                track_ids.append(archived_ids[archived_filenames.index(entry.stem)])
-        
-        tracks = Zotify.invoke_url_bulk(TRACK_BULK_URL, track_ids, TRACKS)
-        
-        pos = 1
-        pbar = Printer.pbar(track_paths, unit='tracks', pos=pos, 
-                            disable=not Zotify.CONFIG.get_show_url_pbar())
-        for i, track_path in enumerate(pbar):
-            update_track_metadata(track_ids[i], track_path, tracks[i])
+        verify_library()
     
     else:
         search(Printer.get_input('Enter search: '))
     
-    Printer.debug(f"Total API Calls: {Zotify.TOTAL_API_CALLS}")
+    PostProcessor.drain()
+    DirectoryCache.clear()
+
+    Printer.debug(f"Total API Calls: {Zotify.TOTAL_API_CALLS}",
+                  f"Token Fetches Avoided: {Zotify.TOKEN_FETCHES_AVOIDED}")
+    Printer.flush()
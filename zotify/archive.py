@@ -0,0 +1,299 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path, PurePath
+from typing import Optional
+
+from zotify.config import Zotify
+from zotify.termoutput import Printer
+
+
+def open_database(db_path: PurePath) -> sqlite3.Connection:
+    """ Opens a SQLite database that may be shared between threads (callers serialize access) """
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    return conn
+
+
+def get_meta(conn: sqlite3.Connection, key: str, default: Optional[str] = None) -> Optional[str]:
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: str) -> None:
+    conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+
+class SongArchive:
+    """
+    Indexed view of the all-time song archive.
+    
+    The `.song_archive` TSV stays the append-only log (one line per download), while a SQLite
+    index next to it (`.song_archive.db`) answers membership lookups without loading the file.
+    Any lines appended to the TSV since the last sync (older versions, other processes) are
+    imported transparently, so an existing archive is migrated on first use.
+    """
+    
+    _conn: Optional[sqlite3.Connection] = None
+    _archive_path: Optional[PurePath] = None
+    _lock = threading.RLock()
+    
+    @classmethod
+    def _connect(cls) -> sqlite3.Connection:
+        archive_path = Zotify.CONFIG.get_song_archive_location()
+        if cls._conn is None or cls._archive_path != archive_path:
+            cls.close()
+            conn = open_database(archive_path.with_name(archive_path.name + '.db'))
+            conn.execute('CREATE TABLE IF NOT EXISTS songs (track_id TEXT PRIMARY KEY, date TEXT, ' +\
+                                                          'artist TEXT, name TEXT, filename TEXT)')
+            conn.commit()
+            cls._conn = conn
+            cls._archive_path = archive_path
+            cls._sync_log()
+        return cls._conn
+    
+    @classmethod
+    def _sync_log(cls) -> None:
+        """ Imports any TSV lines not yet present in the index """
+        conn = cls._conn
+        archive_path = Path(cls._archive_path)
+        log_size = archive_path.stat().st_size if archive_path.exists() else 0
+        offset = int(get_meta(conn, 'log_offset', '0'))
+        if log_size == offset:
+            return
+        
+        with conn:
+            if log_size < offset:
+                # archive was truncated or replaced, rebuild the index from scratch
+                conn.execute('DELETE FROM songs')
+                offset = 0
+            
+            with open(archive_path, 'rb') as file:
+                file.seek(offset)
+                tail = file.read()
+            # a concurrent writer may be mid-line, only consume complete lines
+            tail = tail[:tail.rfind(b'\n') + 1]
+            
+            rows = []
+            for line in tail.decode('utf-8', errors='replace').splitlines():
+                parts = line.strip().split('\t')
+                if len(parts) >= 4:
+                    filename = parts[4] if len(parts) >= 5 else ''
+                    rows.append((parts[0], parts[1], parts[2], parts[3], filename))
+            conn.executemany('INSERT OR REPLACE INTO songs (track_id, date, artist, name, filename) ' +\
+                             'VALUES (?, ?, ?, ?, ?)', rows)
+            set_meta(conn, 'log_offset', str(offset + len(tail)))
+    
+    @classmethod
+    def get(cls, track_id: str) -> Optional[dict[str, str]]:
+        """ Returns the archived {artist, name} of a track, or None if it was never downloaded """
+        if Zotify.CONFIG.get_disable_song_archive():
+            return None
+        with cls._lock:
+            row = cls._connect().execute('SELECT artist, name FROM songs WHERE track_id = ?', (track_id,)).fetchone()
+        if row is None:
+            return None
+        return {'artist': row[0], 'name': row[1]}
+    
+    @classmethod
+    def filenames(cls) -> list[tuple[str, str]]:
+        """ Returns (track_id, filename) for every archived track """
+        if Zotify.CONFIG.get_disable_song_archive():
+            return []
+        with cls._lock:
+            return cls._connect().execute("SELECT track_id, filename FROM songs WHERE filename != ''").fetchall()
+    
+    @classmethod
+    def add(cls, track_id: str, filename: str, author_name: str, track_name: str) -> None:
+        """ Appends an entry to the TSV log and indexes it """
+        if Zotify.CONFIG.get_disable_song_archive():
+            return
+        with cls._lock:
+            cls._connect()
+            with open(cls._archive_path, 'a', encoding='utf-8') as file:
+                file.write(f'{track_id}\t{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\t{author_name}\t{track_name}\t{filename}\n')
+            cls._sync_log()
+    
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+            cls._conn = None
+            cls._archive_path = None
+
+
+class LibraryIndex:
+    """
+    Library-wide index of downloaded tracks, stored as `.song_ids.db` in ROOT_PATH.
+    
+    Maps each track ID to the path (relative to ROOT_PATH), size and mtime of every file it was
+    saved as. Replaces the hidden per-directory `.song_ids` files, which are absorbed into the
+    index the first time it is opened. Also records the last downloaded snapshot of each playlist,
+    so unchanged playlists can be skipped.
+    """
+    
+    _conn: Optional[sqlite3.Connection] = None
+    _root_path: Optional[PurePath] = None
+    _lock = threading.RLock()
+    
+    @classmethod
+    def _connect(cls) -> sqlite3.Connection:
+        root_path = Zotify.CONFIG.get_root_path()
+        if cls._conn is None or cls._root_path != root_path:
+            cls.close()
+            conn = open_database(root_path / '.song_ids.db')
+            conn.execute('CREATE TABLE IF NOT EXISTS library (path TEXT PRIMARY KEY, directory TEXT NOT NULL, ' +\
+                                                            'track_id TEXT NOT NULL, size INTEGER, mtime INTEGER, ' +\
+                                                            'date TEXT, artist TEXT, name TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS library_track_id ON library (track_id, directory)')
+            conn.execute('CREATE TABLE IF NOT EXISTS verified (path TEXT PRIMARY KEY, track_id TEXT NOT NULL, ' +\
+                                                             'size INTEGER, mtime INTEGER, metadata_hash TEXT, date TEXT)')
+            conn.execute('CREATE TABLE IF NOT EXISTS playlists (playlist_id TEXT PRIMARY KEY, snapshot_id TEXT, ' +\
+                                                              'settings TEXT, complete INTEGER, items TEXT, date TEXT)')
+            conn.commit()
+            cls._conn = conn
+            cls._root_path = root_path
+            if get_meta(conn, 'migrated_song_ids') is None:
+                cls._migrate_song_ids()
+        return cls._conn
+    
+    @classmethod
+    def _relative(cls, path: PurePath) -> str:
+        try:
+            return PurePath(path).relative_to(cls._root_path).as_posix()
+        except ValueError:
+            # outside of ROOT_PATH, keep the full path as the key
+            return PurePath(path).as_posix()
+    
+    @staticmethod
+    def _stat(path: PurePath) -> tuple[Optional[int], Optional[int]]:
+        try:
+            st = Path(path).stat()
+        except OSError:
+            return None, None
+        return st.st_size, st.st_mtime_ns
+    
+    @classmethod
+    def _migrate_song_ids(cls) -> None:
+        """ Absorbs legacy per-directory `.song_ids` files into the index """
+        rows = []
+        for dirpath, dirnames, filenames in os.walk(Path(cls._root_path)):
+            if '.song_ids' not in filenames:
+                continue
+            with open(Path(dirpath) / '.song_ids', 'r', encoding='utf-8', errors='replace') as file:
+                for line in file:
+                    parts = line.strip().split('\t')
+                    if len(parts) < 5:
+                        continue
+                    track_path = PurePath(dirpath) / parts[4]
+                    size, mtime = cls._stat(track_path)
+                    rows.append((cls._relative(track_path), cls._relative(PurePath(dirpath)), parts[0],
+                                 size, mtime, parts[1], parts[2], parts[3]))
+        
+        with cls._conn:
+            cls._conn.executemany('INSERT OR REPLACE INTO library (path, directory, track_id, size, mtime, date, artist, name) ' +\
+                                  'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            set_meta(cls._conn, 'migrated_song_ids', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        if rows:
+            Printer.debug(f'Migrated {len(rows)} .song_ids entries into {cls._root_path / ".song_ids.db"}')
+    
+    @classmethod
+    def contains(cls, track_id: str, directory: PurePath) -> bool:
+        """ Returns True if the track was saved into the given directory """
+        with cls._lock:
+            conn = cls._connect()
+            row = conn.execute('SELECT 1 FROM library WHERE track_id = ? AND directory = ? LIMIT 1',
+                               (track_id, cls._relative(directory))).fetchone()
+        return row is not None
+    
+    @classmethod
+    def find(cls, track_id: str) -> list[dict]:
+        """ Returns every indexed file of a track as {path, size, mtime} """
+        with cls._lock:
+            conn = cls._connect()
+            rows = conn.execute('SELECT path, size, mtime FROM library WHERE track_id = ?', (track_id,)).fetchall()
+            root_path = cls._root_path
+        return [{'path': root_path / path, 'size': size, 'mtime': mtime} for path, size, mtime in rows]
+    
+    @classmethod
+    def track_ids_by_path(cls) -> dict[PurePath, str]:
+        """ Returns a mapping of every indexed file path to its track ID """
+        with cls._lock:
+            conn = cls._connect()
+            rows = conn.execute('SELECT path, track_id FROM library').fetchall()
+            root_path = cls._root_path
+        return {root_path / path: track_id for path, track_id in rows}
+    
+    @classmethod
+    def fingerprints(cls) -> dict[PurePath, tuple[str, Optional[int], Optional[int], str]]:
+        """ Returns (track_id, size, mtime, metadata_hash) of every file as of its last library verification """
+        with cls._lock:
+            conn = cls._connect()
+            rows = conn.execute('SELECT path, track_id, size, mtime, metadata_hash FROM verified').fetchall()
+            root_path = cls._root_path
+        return {root_path / path: (track_id, size, mtime, metadata_hash) for path, track_id, size, mtime, metadata_hash in rows}
+    
+    @classmethod
+    def set_fingerprints(cls, verified: list[tuple[PurePath, str, str]]) -> None:
+        """ Records (track_path, track_id, metadata_hash) of freshly verified files with their current size and mtime """
+        date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [(track_path, track_id, *cls._stat(track_path), metadata_hash) for track_path, track_id, metadata_hash in verified]
+        with cls._lock:
+            conn = cls._connect()
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO verified (path, track_id, size, mtime, metadata_hash, date) ' +\
+                                 'VALUES (?, ?, ?, ?, ?, ?)',
+                                 [(cls._relative(track_path), track_id, size, mtime, metadata_hash, date)
+                                  for track_path, track_id, size, mtime, metadata_hash in rows])
+    
+    @classmethod
+    def playlist_state(cls, playlist_id: str) -> Optional[dict]:
+        """ Returns {snapshot_id, settings, complete, items} as of the last download of a playlist, or None """
+        with cls._lock:
+            conn = cls._connect()
+            row = conn.execute('SELECT snapshot_id, settings, complete, items FROM playlists WHERE playlist_id = ?',
+                               (playlist_id,)).fetchone()
+            root_path = cls._root_path
+        if row is None:
+            return None
+        snapshot_id, settings, complete, items = row
+        return {'snapshot_id': snapshot_id, 'settings': settings, 'complete': bool(complete),
+                'items': {item_id: root_path / path for item_id, path in json.loads(items).items()}}
+    
+    @classmethod
+    def set_playlist_state(cls, playlist_id: str, snapshot_id: str, settings: str, complete: bool,
+                           items: dict[str, PurePath]) -> None:
+        """ Records the snapshot of a playlist that was downloaded and the file each resolved item was found at """
+        with cls._lock:
+            conn = cls._connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO playlists (playlist_id, snapshot_id, settings, complete, items, date) ' +\
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             (playlist_id, snapshot_id, settings, int(complete),
+                              json.dumps({item_id: cls._relative(path) for item_id, path in items.items()}),
+                              datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    
+    @classmethod
+    def add(cls, track_path: PurePath, track_id: str, author_name: str, track_name: str) -> None:
+        size, mtime = cls._stat(track_path)
+        with cls._lock:
+            conn = cls._connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO library (path, directory, track_id, size, mtime, date, artist, name) ' +\
+                             'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (cls._relative(track_path), cls._relative(PurePath(track_path).parent), track_id, size, mtime,
+                              datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), author_name, track_name))
+    
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+            cls._conn = None
+            cls._root_path = None
@@ -0,0 +1,278 @@
+"""
+Offline benchmark of the download pipeline.
+
+Replaces the API (`Zotify.invoke_url`) and the audio backend (`Zotify.get_content_stream`) with a
+local stand-in serving generated JSON and a synthetic Ogg Vorbis stream, then drives the real
+download_album, download_playlist and download_track paths into a temporary library.
+"""
+
+import io
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from argparse import Namespace
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlparse, parse_qs
+
+from zotify import album, playlist, track
+from zotify.cache import CoverArtCache
+from zotify.config import Zotify
+from zotify.const import ALBUM_URL, ARTIST_URL, PLAYLIST_URL, TRACK_URL, ROOT_PATH, ROOT_PODCAST_PATH, \
+    SONG_ARCHIVE_LOCATION, CACHE_LOCATION, TEMP_DOWNLOAD_DIR, BULK_WAIT_TIME, DOWNLOAD_REAL_TIME, \
+    SKIP_EXISTING, SKIP_PREVIOUSLY_DOWNLOADED, DOWNLOAD_PARENT_ALBUM, ITEMS, TRACKS, ARTISTS, ID, NAME
+from zotify.postprocess import PostProcessor
+from zotify.termoutput import Printer, PrintChannel
+
+BENCH_TRACK_SECONDS = 30
+BASE62 = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def bench_id(kind: str, n: int) -> str:
+    """ Returns a 22 character base62 ID, valid for TrackId.from_base62 """
+    digits = ''
+    while n or not digits:
+        n, r = divmod(n, 62)
+        digits = BASE62[r] + digits
+    return ('bench' + kind).ljust(22 - len(digits), '0') + digits
+
+
+def ffmpeg_output(*args: str) -> bytes:
+    return subprocess.run(['ffmpeg', '-hide_banner', '-loglevel', 'error', *args, 'pipe:1'],
+                          capture_output=True, check=True).stdout
+
+
+class FakeStream:
+    """ Mimics the librespot content stream read by download_track """
+    
+    def __init__(self, audio: bytes):
+        self.input_stream = self
+        self.size = len(audio)
+        self._buffer = io.BytesIO(audio)
+    
+    def stream(self):
+        return self._buffer
+
+
+class FakeSession:
+    def get_user_attribute(self, key: str) -> str:
+        return 'premium'
+
+
+class FakeBackend:
+    """ Serves generated API objects for one album and one playlist of `n_tracks` each """
+    
+    def __init__(self, n_tracks: int, audio: bytes):
+        self.audio = audio
+        self.artist = {ID: bench_id('Ar', 0), NAME: 'Bench Artist', 'genres': ['bench', 'synthetic'], 'type': 'artist'}
+        self.albums: dict[str, dict] = {}
+        self.tracks: dict[str, dict] = {}
+        self.playlists: dict[str, list[dict]] = {}
+        
+        self.album_id = self._add_album(0, n_tracks)
+        playlist_tracks = [self._add_album(n + 1, 1, single=True) for n in range(n_tracks)]
+        self.playlist_id = bench_id('Pl', 0)
+        self.playlists[self.playlist_id] = [self.albums[album_id][TRACKS][ITEMS][0][ID] for album_id in playlist_tracks]
+        self.single_ids = [self.albums[self._add_album(n_tracks + 1 + n, 1, single=True)][TRACKS][ITEMS][0][ID]
+                           for n in range(n_tracks)]
+    
+    def _add_album(self, n: int, n_tracks: int, single: bool = False) -> str:
+        album_id = bench_id('Al', n)
+        album_simple = {ID: album_id, NAME: f'Bench Album {n}', 'album_type': 'single' if single else 'album',
+                        'release_date': '2024-01-01', 'total_tracks': n_tracks, ARTISTS: [self.artist],
+                        'images': [{'url': f'https://bench.invalid/cover/{album_id}', 'width': 64, 'height': 64}]}
+        items = []
+        for t in range(n_tracks):
+            track_id = bench_id('Tr', n * 100000 + t)
+            track_resp = {ID: track_id, NAME: f'Bench Track {n}-{t + 1}', ARTISTS: [self.artist], 'album': album_simple,
+                          'track_number': t + 1, 'disc_number': 1, 'duration_ms': BENCH_TRACK_SECONDS * 1000,
+                          'is_playable': True, 'type': 'track'}
+            self.tracks[track_id] = track_resp
+            items.append(track_resp)
+        self.albums[album_id] = dict(album_simple, **{TRACKS: {ITEMS: items}})
+        return album_id
+    
+    @staticmethod
+    def _ids(url: str) -> list[str]:
+        ids = parse_qs(urlparse(url.replace('%2c', ',')).query).get('ids', [''])[0]
+        return [item_id for item_id in ids.split(',') if item_id]
+    
+    def invoke_url(self, url: str, _params: Optional[dict] = None, expectFail: bool = False) -> tuple[str, dict]:
+        Zotify.TOTAL_API_CALLS += 1
+        path = urlparse(url).path
+        if url.startswith(TRACK_URL):
+            resp = {TRACKS: [self.tracks.get(track_id) for track_id in self._ids(url)]}
+        elif url.startswith(ARTIST_URL + '?'):
+            resp = {ARTISTS: [self.artist for _ in self._ids(url)]}
+        elif url.startswith(ALBUM_URL):
+            album_id = path.split('/')[3]
+            if path.endswith('/tracks'):
+                items = self.albums[album_id][TRACKS][ITEMS]
+                resp = {ITEMS: items, 'next': None, 'total': len(items)}
+            else:
+                resp = self.albums[album_id]
+        elif url.startswith(PLAYLIST_URL):
+            playlist_id = path.split('/')[3]
+            if path.endswith('/tracks'):
+                items = [{'added_at': '2024-01-01T00:00:00Z', 'track': self.tracks[track_id]}
+                         for track_id in self.playlists[playlist_id]]
+                resp = {ITEMS: items, 'next': None, 'total': len(items)}
+            else:
+                resp = {NAME: 'Bench Playlist', 'owner': {'display_name': 'bench'}}
+        elif 'color-lyrics' in url:
+            resp = {'lyrics': {'syncType': 'LINE_SYNCED',
+                               'lines': [{'startTimeMs': str(i * 5000), 'words': f'line {i}'} for i in range(6)]}}
+        else:
+            resp = {'error': {'status': 404, 'message': f'bench backend has no route for {url}'}}
+        return '', resp
+    
+    def get_content_stream(self, content_id, quality) -> FakeStream:
+        return FakeStream(self.audio)
+
+
+class StageTimer:
+    """ Accumulates wall time per wrapped function, safe to use from post-processing workers """
+    
+    def __init__(self):
+        self.calls: dict[tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, stage: str, attr: str, elapsed: float) -> None:
+        with self._lock:
+            entry = self.calls.setdefault((stage, attr), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+    
+    def wrap(self, owner, attr: str, stage: str) -> None:
+        func: Callable = getattr(owner, attr)
+        
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, attr, time.perf_counter() - start)
+        
+        setattr(owner, attr, timed)
+    
+    def total(self, attrs: set[str]) -> float:
+        return sum(entry[1] for (stage, attr), entry in self.calls.items() if attr in attrs)
+    
+    def stages(self) -> dict[str, list]:
+        stages: dict[str, list] = {}
+        for (stage, attr), (count, total, max_time) in self.calls.items():
+            entry = stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], max_time)
+        return stages
+
+
+def peak_rss_mb() -> tuple[Optional[float], Optional[float]]:
+    """ Returns the peak resident set size of this process and of its children (ffmpeg) in MiB """
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+# calls made by download_track itself, on the download thread
+INLINE_CALLS = {'get_track_metadata', 'get_track_genres', 'handle_lyrics', 'get_archived_track_info',
+                'in_directory_song_archive', 'add_to_m3u8', 'submit'}
+
+
+def instrument(timer: StageTimer) -> None:
+    """ Times the pipeline stages by wrapping the functions download_track looks up at call time """
+    for owner in (album, playlist):
+        timer.wrap(owner, 'prefetch_track_resps', 'metadata')
+    for attr in ('get_track_metadata', 'get_track_genres', 'handle_lyrics'):
+        timer.wrap(track, attr, 'metadata')
+    timer.wrap(track, 'convert_audio_format', 'ffmpeg')
+    for attr in ('set_audio_tags', 'get_album_art', 'save_album_art_jpg'):
+        timer.wrap(track, attr, 'tagging')
+    for attr in ('get_archived_track_info', 'in_directory_song_archive', 'add_to_song_archive',
+                 'add_to_directory_song_archive', 'add_to_m3u8'):
+        timer.wrap(track, attr, 'archive')
+    # inline (POSTPROCESS_WORKERS 0) this covers all post-processing, otherwise only the backpressure wait
+    timer.wrap(PostProcessor, 'submit', 'postprocess submit')
+    for owner in (track, album, playlist):
+        timer.wrap(owner, 'download_track', 'download_track')
+
+
+def run_bench(args: Namespace) -> None:
+    """ Runs the album, playlist and single-track scenarios against the local backend and prints a report """
+    n_tracks = args.bench
+    if n_tracks < 1:
+        Printer.hashtaged(PrintChannel.ERROR, 'INVALID BENCHMARK SIZE\n' +\
+                                              'TRACKS must be at least 1')
+        return
+    if shutil.which('ffmpeg') is None:
+        Printer.hashtaged(PrintChannel.ERROR, 'FFMPEG NOT FOUND\n' +\
+                                              'The benchmark needs FFMPEG to generate synthetic audio')
+        return
+    
+    Zotify.CONFIG.load(args)
+    bench_dir = Path(tempfile.mkdtemp(prefix='zotify-bench-'))
+    for key, value in ((ROOT_PATH, str(bench_dir / 'Music')), (ROOT_PODCAST_PATH, str(bench_dir / 'Podcasts')),
+                       (SONG_ARCHIVE_LOCATION, str(bench_dir / 'archive')), (CACHE_LOCATION, str(bench_dir / 'cache')),
+                       (TEMP_DOWNLOAD_DIR, ''), (BULK_WAIT_TIME, 0), (DOWNLOAD_REAL_TIME, False), (SKIP_EXISTING, False),
+                       (SKIP_PREVIOUSLY_DOWNLOADED, False), (DOWNLOAD_PARENT_ALBUM, False)):
+        Zotify.CONFIG.Values[key] = value
+    Zotify.CONFIG.freeze()
+    Zotify.USER_CONFIGURED_BULK_WAIT_TIME = 0
+    
+    Printer.hashtaged(PrintChannel.MANDATORY, f'GENERATING {BENCH_TRACK_SECONDS}s SYNTHETIC OGG VORBIS STREAM')
+    audio = ffmpeg_output('-f', 'lavfi', '-i', f'sine=frequency=440:duration={BENCH_TRACK_SECONDS}',
+                          '-c:a', 'libvorbis', '-q:a', '5', '-f', 'ogg')
+    cover = ffmpeg_output('-f', 'lavfi', '-i', 'testsrc=size=640x640', '-frames:v', '1', '-f', 'mjpeg')
+    
+    backend = FakeBackend(n_tracks, audio)
+    saved = (Zotify.SESSION, Zotify.invoke_url, Zotify.get_content_stream, CoverArtCache._fetch)
+    Zotify.SESSION = FakeSession()
+    Zotify.invoke_url = backend.invoke_url
+    Zotify.get_content_stream = backend.get_content_stream
+    CoverArtCache._fetch = staticmethod(lambda image_url, timeout=None: cover)
+    
+    timer = StageTimer()
+    instrument(timer)
+    
+    scenarios = (
+        ('album', lambda: album.download_album(None, backend.album_id)),
+        ('playlist', lambda: playlist.download_playlist(None, {ID: backend.playlist_id, NAME: 'Bench Playlist'})),
+        ('single', lambda: [track.download_track(None, 'single', track_id) for track_id in backend.single_ids]),
+    )
+    results = []
+    try:
+        for name, scenario in scenarios:
+            api_calls = Zotify.TOTAL_API_CALLS
+            start = time.perf_counter()
+            scenario()
+            PostProcessor.drain()
+            elapsed = time.perf_counter() - start
+            results.append([name, n_tracks, f'{elapsed:.2f}', f'{n_tracks / elapsed:.2f}', Zotify.TOTAL_API_CALLS - api_calls])
+    finally:
+        Zotify.SESSION, Zotify.invoke_url, Zotify.get_content_stream, CoverArtCache._fetch = saved
+        shutil.rmtree(bench_dir, ignore_errors=True)
+    
+    # whatever download_track spent outside of the instrumented calls is the stream loop itself
+    stages = timer.stages()
+    track_calls, track_total, _ = stages.pop('download_track', [0, 0.0, 0.0])
+    stages['stream'] = [track_calls, max(track_total - timer.total(INLINE_CALLS), 0.0), None]
+    
+    rows = [[stage, count, f'{total:.3f}', f'{total / count * 1000:.1f}' if count else '-',
+             f'{max_time * 1000:.1f}' if max_time is not None else '-']
+            for stage, (count, total, max_time) in stages.items()]
+    Printer.table('SCENARIOS', ('Scenario', 'Tracks', 'Seconds', 'Tracks/s', 'API Calls'), results)
+    Printer.table('STAGES', ('Stage', 'Calls', 'Total s', 'Mean ms', 'Max ms'), rows)
+    
+    rss_self, rss_children = peak_rss_mb()
+    if rss_self is not None:
+        Printer.hashtaged(PrintChannel.MANDATORY, f'PEAK RSS: {rss_self:.1f} MiB (FFMPEG CHILDREN: {rss_children:.1f} MiB)\n' +\
+                                                  f'POSTPROCESS_WORKERS: {Zotify.CONFIG.get_postprocess_workers()}')
@@ -0,0 +1,393 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path, PurePath
+from typing import Optional
+
+from zotify.archive import open_database
+from zotify.config import Zotify
+from zotify.const import ARTIST_BULK_URL, ARTISTS, ID, NAME, GENRES
+from zotify.termoutput import Printer
+
+
+class ArtistCache:
+    """
+    TTL cache of artist metadata (name and genres) keyed by artist ID.
+    
+    Entries live in memory for the session and, when PERSIST_ARTIST_CACHE is set, in
+    `artists.db` under CACHE_LOCATION so later runs reuse them until ARTIST_CACHE_TTL expires.
+    """
+    
+    _artists: dict[str, tuple[float, dict]] = {}
+    _conn: Optional[sqlite3.Connection] = None
+    _db_path: Optional[PurePath] = None
+    _lock = threading.RLock()
+    
+    @classmethod
+    def _connect(cls) -> Optional[sqlite3.Connection]:
+        if not Zotify.CONFIG.get_persist_artist_cache():
+            return None
+        db_path = Zotify.CONFIG.get_cache_location() / 'artists.db'
+        if cls._conn is None or cls._db_path != db_path:
+            cls.close()
+            conn = open_database(db_path)
+            conn.execute('CREATE TABLE IF NOT EXISTS artists (artist_id TEXT PRIMARY KEY, fetched REAL, data TEXT)')
+            with conn:
+                conn.execute('DELETE FROM artists WHERE fetched < ?', (time.time() - Zotify.CONFIG.get_artist_cache_ttl(),))
+            cls._conn = conn
+            cls._db_path = db_path
+        return cls._conn
+    
+    @classmethod
+    def _load_persisted(cls, artist_ids: list[str], expiry: float) -> None:
+        conn = cls._connect()
+        if conn is None or not artist_ids:
+            return
+        placeholders = ','.join('?' * len(artist_ids))
+        rows = conn.execute(f'SELECT artist_id, fetched, data FROM artists WHERE artist_id IN ({placeholders}) ' +\
+                             'AND fetched >= ?', (*artist_ids, expiry)).fetchall()
+        for artist_id, fetched, data in rows:
+            cls._artists[artist_id] = (fetched, json.loads(data))
+    
+    @classmethod
+    def _store(cls, artists: list[dict]) -> None:
+        now = time.time()
+        rows = []
+        for artist in artists:
+            entry = {ID: artist[ID], NAME: artist.get(NAME), GENRES: artist.get(GENRES, [])}
+            cls._artists[artist[ID]] = (now, entry)
+            rows.append((artist[ID], now, json.dumps(entry)))
+        conn = cls._connect()
+        if conn is not None and rows:
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO artists (artist_id, fetched, data) VALUES (?, ?, ?)', rows)
+    
+    @classmethod
+    def get_artists(cls, artist_ids: list[str]) -> list[dict]:
+        """ Returns {id, name, genres} for each artist, fetching only those missing or expired """
+        ttl = Zotify.CONFIG.get_artist_cache_ttl()
+        unique_ids = list(dict.fromkeys(artist_ids))
+        
+        with cls._lock:
+            expiry = time.time() - ttl
+            missing = [artist_id for artist_id in unique_ids
+                       if artist_id not in cls._artists or cls._artists[artist_id][0] < expiry]
+            if ttl and missing:
+                cls._load_persisted(missing, expiry)
+                missing = [artist_id for artist_id in missing
+                           if artist_id not in cls._artists or cls._artists[artist_id][0] < expiry]
+        
+        if missing:
+            artists = Zotify.invoke_url_bulk(ARTIST_BULK_URL, missing, ARTISTS)
+            with cls._lock:
+                cls._store([artist for artist in artists if artist and ID in artist])
+        
+        with cls._lock:
+            return [cls._artists[artist_id][1] for artist_id in artist_ids if artist_id in cls._artists]
+    
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+            cls._conn = None
+            cls._db_path = None
+
+
+class CoverArtCache:
+    """
+    Cover art keyed by image URL, shared by the tagger and the GUI.
+    
+    Recently used images are kept in a bounded in-memory LRU; every fetched image is also stored
+    under CACHE_LOCATION/covers so it is downloaded at most once across runs.
+    """
+    
+    MAX_MEMORY_ITEMS = 64
+    _images: OrderedDict[str, bytes] = OrderedDict()
+    _fetching: dict[str, threading.Lock] = {}
+    _lock = threading.RLock()
+    
+    @staticmethod
+    def _key(image_url: str) -> str:
+        return hashlib.sha1(image_url.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def _disk_path(cls, image_url: str) -> Path:
+        return Path(Zotify.CONFIG.get_cache_location()) / 'covers' / (cls._key(image_url) + '.jpg')
+    
+    @classmethod
+    def _fetch(cls, image_url: str, timeout: Optional[float] = None) -> bytes:
+        response = Zotify.http_get(image_url, **({'timeout': timeout} if timeout is not None else {}))
+        response.raise_for_status()
+        return response.content
+    
+    @classmethod
+    def _remember(cls, image_url: str, img: bytes) -> None:
+        with cls._lock:
+            cls._images[image_url] = img
+            cls._images.move_to_end(image_url)
+            while len(cls._images) > cls.MAX_MEMORY_ITEMS:
+                cls._images.popitem(last=False)
+    
+    @classmethod
+    def get(cls, image_url: str, timeout: Optional[float] = None) -> bytes:
+        """ Returns the image bytes, from memory, disk or the network in that order (timeout defaults to HTTP_TIMEOUT) """
+        with cls._lock:
+            if image_url in cls._images:
+                cls._images.move_to_end(image_url)
+                return cls._images[image_url]
+            fetch_lock = cls._fetching.setdefault(image_url, threading.Lock())
+        
+        # concurrent requests for the same cover wait for a single download
+        try:
+            with fetch_lock:
+                with cls._lock:
+                    if image_url in cls._images:
+                        return cls._images[image_url]
+                
+                disk_path = cls._disk_path(image_url)
+                try:
+                    img = disk_path.read_bytes()
+                except OSError:
+                    img = b''
+                
+                if not img:
+                    img = cls._fetch(image_url, timeout)
+                    try:
+                        disk_path.parent.mkdir(parents=True, exist_ok=True)
+                        tmp_path = disk_path.with_name(f'{disk_path.stem}.{threading.get_ident()}.tmp')
+                        tmp_path.write_bytes(img)
+                        os.replace(tmp_path, disk_path)
+                    except OSError as e:
+                        Printer.debug(f'Failed to cache cover art {image_url}: {e}')
+                
+                cls._remember(image_url, img)
+        finally:
+            with cls._lock:
+                cls._fetching.pop(image_url, None)
+        return img
+
+
+class LocalTrackCache:
+    """
+    Text tags (title, artists, album) of local library files, stored in `local_tracks.db` under
+    CACHE_LOCATION and keyed by path. Entries are only reused while the file's size and mtime match.
+    """
+    
+    _conn: Optional[sqlite3.Connection] = None
+    _db_path: Optional[PurePath] = None
+    _lock = threading.RLock()
+    
+    @classmethod
+    def _connect(cls) -> sqlite3.Connection:
+        db_path = Zotify.CONFIG.get_cache_location() / 'local_tracks.db'
+        if cls._conn is None or cls._db_path != db_path:
+            cls.close()
+            conn = open_database(db_path)
+            conn.execute('CREATE TABLE IF NOT EXISTS tracks (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, ' +\
+                                                           'name TEXT, artists TEXT, album TEXT)')
+            conn.commit()
+            cls._conn = conn
+            cls._db_path = db_path
+        return cls._conn
+    
+    @classmethod
+    def entries(cls, root: PurePath) -> dict[str, tuple[int, int, dict]]:
+        """ Returns path -> (size, mtime, {name, artists, album}) for every cached file under root """
+        prefix = os.path.join(str(root), '')
+        with cls._lock:
+            rows = cls._connect().execute('SELECT path, size, mtime, name, artists, album FROM tracks ' +\
+                                          'WHERE substr(path, 1, ?) = ?', (len(prefix), prefix)).fetchall()
+        return {path: (size, mtime, {NAME: name, ARTISTS: json.loads(artists), 'album': album})
+                for path, size, mtime, name, artists, album in rows}
+    
+    @classmethod
+    def update(cls, fresh: list[tuple[str, int, int, dict]], removed: list[str]) -> None:
+        """ Stores newly read (path, size, mtime, tags) entries and forgets files that no longer exist """
+        with cls._lock:
+            conn = cls._connect()
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO tracks (path, size, mtime, name, artists, album) ' +\
+                                 'VALUES (?, ?, ?, ?, ?, ?)',
+                                 [(path, size, mtime, tags[NAME], json.dumps(tags[ARTISTS]), tags['album'])
+                                  for path, size, mtime, tags in fresh])
+                conn.executemany('DELETE FROM tracks WHERE path = ?', [(path,) for path in removed])
+    
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+            cls._conn = None
+            cls._db_path = None
+
+
+class UserLibraryCache:
+    """
+    Last synced liked songs and playlists of each user, and the items of each playlist keyed by
+    its snapshot_id, stored in `library.db` under CACHE_LOCATION so the GUI can open from disk
+    and only fetch what changed.
+    """
+    
+    _conn: Optional[sqlite3.Connection] = None
+    _db_path: Optional[PurePath] = None
+    _lock = threading.RLock()
+    
+    @classmethod
+    def _connect(cls) -> sqlite3.Connection:
+        db_path = Zotify.CONFIG.get_cache_location() / 'library.db'
+        if cls._conn is None or cls._db_path != db_path:
+            cls.close()
+            conn = open_database(db_path)
+            conn.execute('CREATE TABLE IF NOT EXISTS liked (user TEXT, item_key TEXT, added_at TEXT, data TEXT, ' +\
+                                                           'PRIMARY KEY (user, item_key))')
+            conn.execute('CREATE TABLE IF NOT EXISTS playlists (user TEXT, position INTEGER, playlist_id TEXT, data TEXT, ' +\
+                                                               'PRIMARY KEY (user, position))')
+            conn.execute('CREATE TABLE IF NOT EXISTS playlist_items (playlist_id TEXT PRIMARY KEY, snapshot_id TEXT, data TEXT)')
+            conn.commit()
+            cls._conn = conn
+            cls._db_path = db_path
+        return cls._conn
+    
+    @classmethod
+    def liked_songs(cls, user: str) -> list[dict]:
+        """ Returns the saved track items of user, newest first """
+        with cls._lock:
+            rows = cls._connect().execute('SELECT data FROM liked WHERE user = ? ORDER BY added_at DESC, rowid DESC',
+                                          (user,)).fetchall()
+        return [json.loads(data) for data, in rows]
+    
+    @classmethod
+    def store_liked_songs(cls, user: str, items: list[tuple[str, dict]], replace: bool = False) -> None:
+        """ Stores (key, item) pairs oldest first, replace drops every song not in items """
+        with cls._lock:
+            conn = cls._connect()
+            with conn:
+                if replace:
+                    conn.execute('DELETE FROM liked WHERE user = ?', (user,))
+                conn.executemany('INSERT OR REPLACE INTO liked (user, item_key, added_at, data) VALUES (?, ?, ?, ?)',
+                                 [(user, key, item.get('added_at'), json.dumps(item)) for key, item in items])
+    
+    @classmethod
+    def playlists(cls, user: str) -> list[dict]:
+        with cls._lock:
+            rows = cls._connect().execute('SELECT data FROM playlists WHERE user = ? ORDER BY position', (user,)).fetchall()
+        return [json.loads(data) for data, in rows]
+    
+    @classmethod
+    def store_playlists(cls, user: str, playlists: list[dict]) -> None:
+        """ Replaces the playlists of user and forgets the items of playlists nobody has anymore """
+        with cls._lock:
+            conn = cls._connect()
+            with conn:
+                conn.execute('DELETE FROM playlists WHERE user = ?', (user,))
+                conn.executemany('INSERT INTO playlists (user, position, playlist_id, data) VALUES (?, ?, ?, ?)',
+                                 [(user, position, playlist[ID], json.dumps(playlist))
+                                  for position, playlist in enumerate(playlists)])
+                conn.execute('DELETE FROM playlist_items WHERE playlist_id NOT IN (SELECT playlist_id FROM playlists)')
+    
+    @classmethod
+    def playlist_items(cls, playlist_id: str, snapshot_id: str) -> Optional[list[dict]]:
+        """ Returns the cached items of a playlist, None unless they were stored for this snapshot_id """
+        with cls._lock:
+            row = cls._connect().execute('SELECT data FROM playlist_items WHERE playlist_id = ? AND snapshot_id = ?',
+                                         (playlist_id, snapshot_id)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+    
+    @classmethod
+    def store_playlist_items(cls, playlist_id: str, snapshot_id: str, items: list[dict]) -> None:
+        with cls._lock:
+            conn = cls._connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO playlist_items (playlist_id, snapshot_id, data) VALUES (?, ?, ?)',
+                             (playlist_id, snapshot_id, json.dumps(items)))
+    
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+            cls._conn = None
+            cls._db_path = None
+
+
+class DirectoryCache:
+    """
+    Per-run listing of the non-empty files in each output directory, read once with os.scandir.
+    
+    Downloads register their final path as soon as they start writing so later tracks see it
+    even while conversion is still running in the background.
+    """
+    
+    _listings: dict[str, set[str]] = {}
+    _next_suffix: dict[tuple[str, str], int] = {}
+    _lock = threading.RLock()
+    
+    @classmethod
+    def _listing(cls, directory: str) -> set[str]:
+        listing = cls._listings.get(directory)
+        if listing is None:
+            listing = set()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_file() and entry.stat().st_size:
+                                listing.add(os.path.normcase(entry.name))
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+            cls._listings[directory] = listing
+        return listing
+    
+    @staticmethod
+    def _split(path: PurePath) -> tuple[str, str]:
+        return str(PurePath(path).parent), os.path.normcase(PurePath(path).name)
+    
+    @classmethod
+    def exists(cls, path: PurePath) -> bool:
+        """ Returns True if a non-empty file is (or is being written) at path """
+        directory, name = cls._split(path)
+        with cls._lock:
+            return name in cls._listing(directory)
+    
+    @classmethod
+    def next_free_path(cls, path: PurePath) -> PurePath:
+        """ Returns the first `<stem>_<n><suffix>` next to path that is not taken """
+        path = PurePath(path)
+        directory, _ = cls._split(path)
+        with cls._lock:
+            listing = cls._listing(directory)
+            c = cls._next_suffix.get((directory, path.name), 1)
+            while os.path.normcase(f'{path.stem}_{c}{path.suffix}') in listing:
+                c += 1
+            cls._next_suffix[(directory, path.name)] = c + 1
+        return path.with_name(f'{path.stem}_{c}{path.suffix}')
+    
+    @classmethod
+    def add(cls, path: PurePath) -> None:
+        directory, name = cls._split(path)
+        with cls._lock:
+            cls._listing(directory).add(name)
+    
+    @classmethod
+    def release(cls, path: PurePath) -> None:
+        """ Drops a path registered by add() unless a file actually ended up there """
+        if Path(path).is_file():
+            return
+        directory, name = cls._split(path)
+        with cls._lock:
+            if directory in cls._listings:
+                cls._listings[directory].discard(name)
+    
+    @classmethod
+    def clear(cls) -> None:
+        """ Forgets all listings, files may have changed on disk since the last run """
+        with cls._lock:
+            cls._listings.clear()
+            cls._next_suffix.clear()
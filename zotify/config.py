@@ -1,17 +1,23 @@
 import datetime
+import os
 import logging
 import json
 import base64
 import sys
 import re
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future, ThreadPoolExecutor
 from librespot.audio.decoders import VorbisOnlyAudioQuality, AudioQuality
 from librespot.core import Session, OAuth
 from librespot.mercury import MercuryRequests
 from librespot.proto.Authentication_pb2 import AuthenticationType
+from dataclasses import dataclass
 from pathlib import Path, PurePath
 from time import sleep
-from typing import Any, Callable, Union, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, Union, Optional
 
 from zotify.const import *
 from zotify.const import AudioKeyError
@@ -51,6 +57,7 @@ CONFIG_VALUES = {
     TEMP_DOWNLOAD_DIR:          { 'default': '',                        'type': str,    'arg': ('-td', '--temp-download-dir'             ,) },
     DOWNLOAD_PARENT_ALBUM:      { 'default': 'False',                   'type': bool,   'arg': ('--download-parent-album'                ,) },
     NO_COMPILATION_ALBUMS:      { 'default': 'False',                   'type': bool,   'arg': ('--no-compilation-albums'                ,) },
+    POSTPROCESS_WORKERS:        { 'default': '1',                       'type': int,    'arg': ('--postprocess-workers'                  ,) },
     
     # Regex Options
     REGEX_ENABLED:              { 'default': 'False',                   'type': bool,   'arg': ('--regex-enabled'                        ,) },
@@ -70,6 +77,7 @@ CONFIG_VALUES = {
     SKIP_EXISTING:              { 'default': 'True',                    'type': bool,   'arg': ('-ie', '--skip-existing'                 ,) },
     SKIP_PREVIOUSLY_DOWNLOADED: { 'default': 'False',                   'type': bool,   'arg': ('-ip', '--skip-prev-downloaded', 
                                                                                                 '--skip-previously-downloaded'           ,) },
+    SKIP_UNCHANGED_PLAYLISTS:   { 'default': 'True',                    'type': bool,   'arg': ('--skip-unchanged-playlists'             ,) },
     
     # Playlist File Options
     EXPORT_M3U8:                { 'default': 'False',                   'type': bool,   'arg': ('-e, --export-m3u8'                      ,) },
@@ -86,6 +94,7 @@ CONFIG_VALUES = {
     # Metadata Options
     LANGUAGE:                   { 'default': 'en',                      'type': str,    'arg': ('--language'                             ,) },
     STRICT_LIBRARY_VERIFY:      { 'default': 'True',                    'type': bool,   'arg': ('--strict-library-verify'                ,) },
+    TAG_READ_WORKERS:           { 'default': '0',                       'type': int,    'arg': ('--tag-read-workers'                     ,) },
     MD_DISC_TRACK_TOTALS:       { 'default': 'True',                    'type': bool,   'arg': ('--md-disc-track-totals'                 ,) },
     MD_SAVE_GENRES:             { 'default': 'True',                    'type': bool,   'arg': ('--md-save-genres'                       ,) },
     MD_ALLGENRES:               { 'default': 'False',                   'type': bool,   'arg': ('--md-allgenres'                         ,) },
@@ -98,6 +107,13 @@ CONFIG_VALUES = {
     RETRY_ATTEMPTS:             { 'default': '1',                       'type': int,    'arg': ('--retry-attempts'                       ,) },
     CHUNK_SIZE:                 { 'default': '20000',                   'type': int,    'arg': ('--chunk-size'                           ,) },
     REDIRECT_ADDRESS:           { 'default': '127.0.0.1',               'type': str,    'arg': ('--redirect-address'                     ,) },
+    HTTP_TIMEOUT:               { 'default': '30',                      'type': int,    'arg': ('--http-timeout'                         ,) },
+    HTTP_POOL_SIZE:             { 'default': '10',                      'type': int,    'arg': ('--http-pool-size'                       ,) },
+    
+    # Cache Options
+    CACHE_LOCATION:             { 'default': '',                        'type': str,    'arg': ('--cache-location'                       ,) },
+    ARTIST_CACHE_TTL:           { 'default': '168',                     'type': int,    'arg': ('--artist-cache-ttl'                     ,) },
+    PERSIST_ARTIST_CACHE:       { 'default': 'True',                    'type': bool,   'arg': ('--persist-artist-cache'                 ,) },
     
     # Terminal & Logging Options
     PRINT_SPLASH:               { 'default': 'False',                   'type': bool,   'arg': ('--print-splash'                         ,) },
@@ -125,9 +141,77 @@ DEPRECIATED_CONFIGS = {
 }
 
 
+OUTPUT_MODES = ('playlist', 'extplaylist', 'liked', 'single', 'album')
+OUTPUT_TRACK_FIELDS = frozenset({'artist', 'album_artist', 'album', 'song_name', 'release_year', 'disc_number',
+                                 'track_number', 'total_tracks', 'id', 'track_id'})
+# every extra_keys entry download_album / download_playlist pass to download_track
+OUTPUT_EXTRA_FIELDS = frozenset({'album_num', 'album_artists', 'album_id', 'total_discs',
+                                 'playlist', 'playlist_id', 'playlist_num', 'playlist_track', 'playlist_track_id'})
+
+
+@dataclass(frozen=True)
+class OutputTemplate:
+    """ An OUTPUT template parsed once into literal text and {field} segments """
+    template: str
+    segments: tuple[tuple[bool, str], ...]
+    fields: frozenset
+    
+    FIELD_PATTERN = re.compile(r'\{(\w+)\}')
+    
+    @classmethod
+    def compile(cls, template: str) -> 'OutputTemplate':
+        segments = []
+        pos = 0
+        for match in cls.FIELD_PATTERN.finditer(template):
+            if match.start() > pos:
+                segments.append((False, template[pos:match.start()]))
+            segments.append((True, match.group(1)))
+            pos = match.end()
+        if pos < len(template):
+            segments.append((False, template[pos:]))
+        return cls(template, tuple(segments), frozenset(name for is_field, name in segments if is_field))
+    
+    @property
+    def unknown_fields(self) -> frozenset:
+        return self.fields - OUTPUT_TRACK_FIELDS - OUTPUT_EXTRA_FIELDS
+    
+    def render(self, values: dict[str, str]) -> str:
+        """ Joins the segments, leaving placeholders without a value untouched """
+        return ''.join((values.get(text, '{' + text + '}') if is_field else text) for is_field, text in self.segments)
+    
+    def parent(self) -> 'OutputTemplate':
+        """ Returns the template of the directory part, everything before the last path separator """
+        for i in range(len(self.segments) - 1, -1, -1):
+            is_field, text = self.segments[i]
+            cut = max(text.rfind('/'), text.rfind('\\')) if not is_field else -1
+            if cut >= 0:
+                return OutputTemplate.compile(''.join('{' + t + '}' if f else t for f, t in self.segments[:i]) + text[:cut])
+        return OutputTemplate.compile('')
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """ Resolved, immutable view of the values that are expensive to derive, built by Config.freeze() """
+    root_path: PurePath
+    root_podcast_path: PurePath
+    song_archive_location: PurePath
+    cache_location: PurePath
+    credentials_location: PurePath
+    temp_download_dir: Union[str, PurePath]
+    lyrics_location: Optional[PurePath]
+    m3u8_location: Optional[PurePath]
+    outputs: MappingProxyType
+    output_templates: MappingProxyType
+    regex_track: Optional[re.Pattern]
+    regex_album: Optional[re.Pattern]
+    regex_episode: Optional[re.Pattern]
+
+
 class Config:
     Values = {}
     logger = None
+    Snapshot: Optional[ConfigSnapshot] = None
+    _created_dirs: set[PurePath] = set()
     
     @classmethod
     def load(cls, args) -> None:
@@ -190,6 +274,8 @@ class Config:
             if key.lower() in vars(args) and vars(args)[key.lower()] is not None:
                 cls.Values[key] = cls.parse_arg_value(key, vars(args)[key.lower()])
         
+        cls.freeze()
+        
         # Handle sub-library logging
         if cls.debug():
             logfile = Path(cls.get_root_path()/f"zotify_DEBUG_{Zotify.DATETIME_LAUNCH}.log")
@@ -202,6 +288,14 @@ class Config:
             # for logger in mutedLoggers:
             #     logging.getLogger(logger).disabled = True
         
+        # Confirm output templates
+        unknown_fields = set()
+        for output_template in cls.Snapshot.output_templates.values():
+            unknown_fields |= output_template.unknown_fields
+        if unknown_fields:
+            Printer.hashtaged(PrintChannel.WARNING, 'UNKNOWN OUTPUT TEMPLATE PLACEHOLDERS\n' +\
+                                                    f'{", ".join("{" + f + "}" for f in sorted(unknown_fields))} will be left as-is')
+        
         # Confirm regex patterns
         if cls.get_regex_enabled():
             for mode in ["Track", "Episode", "Album"]:
@@ -212,6 +306,44 @@ class Config:
         if args.no_splash:
             cls.Values[PRINT_SPLASH] = False
     
+    @classmethod
+    def freeze(cls) -> ConfigSnapshot:
+        """ Resolves paths, output templates and regex patterns once, call again after changing Values """
+        cls.Snapshot = None
+        cls._created_dirs = set()
+        root_path = cls._resolve_root_path()
+        outputs = {mode: cls._resolve_output(mode) for mode in OUTPUT_MODES}
+        cls.Snapshot = ConfigSnapshot(
+            root_path=root_path,
+            root_podcast_path=cls._resolve_root_podcast_path(root_path),
+            song_archive_location=cls._resolve_song_archive_location(root_path),
+            cache_location=cls._resolve_cache_location(root_path),
+            credentials_location=cls._resolve_credentials_location(root_path),
+            temp_download_dir=cls._resolve_temp_download_dir(root_path),
+            lyrics_location=cls._resolve_location(LYRICS_LOCATION, root_path),
+            m3u8_location=cls._resolve_location(M3U8_LOCATION, root_path),
+            outputs=MappingProxyType(outputs),
+            output_templates=MappingProxyType({mode: OutputTemplate.compile(v) for mode, v in outputs.items()}),
+            regex_track=cls._compile_regex(REGEX_TRACK_SKIP),
+            regex_album=cls._compile_regex(REGEX_ALBUM_SKIP),
+            regex_episode=cls._compile_regex(REGEX_EPISODE_SKIP),
+        )
+        return cls.Snapshot
+    
+    @classmethod
+    def _snapshot(cls) -> ConfigSnapshot:
+        if cls.Snapshot is None:
+            return cls.freeze()
+        return cls.Snapshot
+    
+    @classmethod
+    def _ensure_dir(cls, dir_path: PurePath) -> PurePath:
+        """ Creates a configured directory the first time it is requested """
+        if dir_path not in cls._created_dirs:
+            Path(dir_path).mkdir(parents=True, exist_ok=True)
+            cls._created_dirs.add(dir_path)
+        return dir_path
+    
     @classmethod
     def get_default_json(cls) -> dict:
         r = {}
@@ -254,25 +386,27 @@ class Config:
         return cls.Values.get(DEBUG)
     
     @classmethod
-    def get_root_path(cls) -> PurePath:
+    def _resolve_root_path(cls) -> PurePath:
         if cls.get(ROOT_PATH) == '':
-            root_path = PurePath(Path.home() / 'Music/Zotify Music/')
-        else:
-            root_path = PurePath(Path(cls.get(ROOT_PATH)).expanduser())
-        Path(root_path).mkdir(parents=True, exist_ok=True)
-        return root_path
+            return PurePath(Path.home() / 'Music/Zotify Music/')
+        return PurePath(Path(cls.get(ROOT_PATH)).expanduser())
     
     @classmethod
-    def get_root_podcast_path(cls) -> PurePath:
+    def get_root_path(cls) -> PurePath:
+        return cls._ensure_dir(cls._snapshot().root_path)
+    
+    @classmethod
+    def _resolve_root_podcast_path(cls, root_path: PurePath) -> PurePath:
         if cls.get(ROOT_PODCAST_PATH) == '':
-            root_podcast_path = PurePath(Path.home() / 'Music/Zotify Podcasts/')
-        else:
-            root_podcast_path:str = cls.get(ROOT_PODCAST_PATH)
-            if root_podcast_path[0] == ".":
-                root_podcast_path = cls.get_root_path() / PurePath(root_podcast_path).relative_to(".")
-            root_podcast_path = PurePath(Path(root_podcast_path).expanduser())
-        Path(root_podcast_path).mkdir(parents=True, exist_ok=True)
-        return root_podcast_path
+            return PurePath(Path.home() / 'Music/Zotify Podcasts/')
+        root_podcast_path:str = cls.get(ROOT_PODCAST_PATH)
+        if root_podcast_path[0] == ".":
+            root_podcast_path = root_path / PurePath(root_podcast_path).relative_to(".")
+        return PurePath(Path(root_podcast_path).expanduser())
+    
+    @classmethod
+    def get_root_podcast_path(cls) -> PurePath:
+        return cls._ensure_dir(cls._snapshot().root_podcast_path)
     
     @classmethod
     def get_skip_existing(cls) -> bool:
@@ -282,6 +416,10 @@ class Config:
     def get_skip_previously_downloaded(cls) -> bool:
         return cls.get(SKIP_PREVIOUSLY_DOWNLOADED)
     
+    @classmethod
+    def get_skip_unchanged_playlists(cls) -> bool:
+        return cls.get(SKIP_UNCHANGED_PLAYLISTS)
+    
     @classmethod
     def get_split_album_discs(cls) -> bool:
         return cls.get(SPLIT_ALBUM_DISCS)
@@ -319,7 +457,7 @@ class Config:
         return cls.get(TRANSCODE_BITRATE)
     
     @classmethod
-    def get_song_archive_location(cls) -> PurePath:
+    def _resolve_song_archive_location(cls, root_path: PurePath) -> PurePath:
         if cls.get(SONG_ARCHIVE_LOCATION) == '':
             system_paths = {
                 'win32': Path.home() / 'AppData/Roaming/Zotify',
@@ -333,17 +471,57 @@ class Config:
         else:
             song_archive_path: str = cls.get(SONG_ARCHIVE_LOCATION)
             if song_archive_path[0] == ".":
-                song_archive_path = cls.get_root_path() / PurePath(song_archive_path).relative_to(".")
+                song_archive_path = root_path / PurePath(song_archive_path).relative_to(".")
             song_archive = PurePath(Path(song_archive_path).expanduser() / ".song_archive")
-        Path(song_archive.parent).mkdir(parents=True, exist_ok=True)
         return song_archive
     
+    @classmethod
+    def get_song_archive_location(cls) -> PurePath:
+        song_archive = cls._snapshot().song_archive_location
+        cls._ensure_dir(song_archive.parent)
+        return song_archive
+    
+    @classmethod
+    def _resolve_cache_location(cls, root_path: PurePath) -> PurePath:
+        if cls.get(CACHE_LOCATION) in {'', None}:
+            system_paths = {
+                'win32': Path.home() / 'AppData/Local/Zotify/Cache',
+                'linux': Path.home() / '.cache/zotify',
+                'darwin': Path.home() / 'Library/Caches/Zotify'
+            }
+            if sys.platform not in system_paths:
+                cache_path = PurePath(Path.cwd() / '.zotify/cache')
+            else:
+                cache_path = PurePath(system_paths[sys.platform])
+        else:
+            cache_path: str = cls.get(CACHE_LOCATION)
+            if cache_path[0] == ".":
+                cache_path = root_path / PurePath(cache_path).relative_to(".")
+            cache_path = PurePath(Path(cache_path).expanduser())
+        return cache_path
+    
+    @classmethod
+    def get_cache_location(cls) -> PurePath:
+        return cls._ensure_dir(cls._snapshot().cache_location)
+    
+    @classmethod
+    def get_artist_cache_ttl(cls) -> int:
+        """ Returns the artist cache lifetime in seconds (configured in hours) """
+        ttl = cls.get(ARTIST_CACHE_TTL)
+        if ttl is None:
+            ttl = int(CONFIG_VALUES[ARTIST_CACHE_TTL]['default'])
+        return max(ttl, 0) * 3600
+    
+    @classmethod
+    def get_persist_artist_cache(cls) -> bool:
+        return cls.get(PERSIST_ARTIST_CACHE)
+    
     @classmethod
     def get_save_credentials(cls) -> bool:
         return cls.get(SAVE_CREDENTIALS)
     
     @classmethod
-    def get_credentials_location(cls) -> PurePath:
+    def _resolve_credentials_location(cls, root_path: PurePath) -> PurePath:
         if cls.get(CREDENTIALS_LOCATION) == '':
             system_paths = {
                 'win32': Path.home() / 'AppData/Roaming/Zotify',
@@ -357,20 +535,37 @@ class Config:
         else:
             credentials_path: str = cls.get(CREDENTIALS_LOCATION)
             if credentials_path[0] == ".":
-                credentials_path = cls.get_root_path() / PurePath(credentials_path).relative_to(".")
+                credentials_path = root_path / PurePath(credentials_path).relative_to(".")
             credentials = PurePath(Path(credentials_path).expanduser() / 'credentials.json')
-        Path(credentials.parent).mkdir(parents=True, exist_ok=True)
         return credentials
     
     @classmethod
-    def get_temp_download_dir(cls) -> Union[str, PurePath]:
+    def get_credentials_location(cls) -> PurePath:
+        credentials = cls._snapshot().credentials_location
+        cls._ensure_dir(credentials.parent)
+        return credentials
+    
+    @classmethod
+    def _resolve_temp_download_dir(cls, root_path: PurePath) -> Union[str, PurePath]:
         if cls.get(TEMP_DOWNLOAD_DIR) == '':
             return ''
         temp_download_path: str = cls.get(TEMP_DOWNLOAD_DIR)
         if temp_download_path[0] == ".":
-            temp_download_path = cls.get_root_path() / PurePath(temp_download_path).relative_to(".")
+            temp_download_path = root_path / PurePath(temp_download_path).relative_to(".")
         return PurePath(Path(temp_download_path).expanduser())
     
+    @classmethod
+    def get_temp_download_dir(cls) -> Union[str, PurePath]:
+        return cls._snapshot().temp_download_dir
+    
+    @classmethod
+    def get_postprocess_workers(cls) -> int:
+        """ Number of background conversion/tagging workers, 0 processes each track inline """
+        workers = cls.get(POSTPROCESS_WORKERS)
+        if workers is None:
+            return int(CONFIG_VALUES[POSTPROCESS_WORKERS]['default'])
+        return max(workers, 0)
+    
     @classmethod
     def get_disc_track_totals(cls) -> bool:
         return cls.get(MD_DISC_TRACK_TOTALS)
@@ -393,6 +588,20 @@ class Config:
     
     @classmethod
     def get_output(cls, mode: str) -> str:
+        outputs = cls._snapshot().outputs
+        if mode not in outputs:
+            raise ValueError()
+        return outputs[mode]
+    
+    @classmethod
+    def get_output_template(cls, mode: str) -> OutputTemplate:
+        output_templates = cls._snapshot().output_templates
+        if mode not in output_templates:
+            raise ValueError()
+        return output_templates[mode]
+    
+    @classmethod
+    def _resolve_output(cls, mode: str) -> str:
         v = cls.get(OUTPUT)
         
         if v:
@@ -429,17 +638,21 @@ class Config:
         return cls.get(DISABLE_SONG_ARCHIVE)
     
     @classmethod
-    def get_lyrics_location(cls) -> Optional[PurePath]:
-        if cls.get(LYRICS_LOCATION) == '':
+    def _resolve_location(cls, key: str, root_path: PurePath) -> Optional[PurePath]:
+        if cls.get(key) == '':
             # Use OUTPUT path as default location
             return None
         else:
-            lyrics_path = cls.get(LYRICS_LOCATION)
-            if lyrics_path[0] == ".":
-                lyrics_path = cls.get_root_path() / PurePath(lyrics_path).relative_to(".")
-            lyrics_path = PurePath(Path(lyrics_path).expanduser())
+            location_path = cls.get(key)
+            if location_path[0] == ".":
+                location_path = root_path / PurePath(location_path).relative_to(".")
+            location_path = PurePath(Path(location_path).expanduser())
         
-        return lyrics_path
+        return location_path
+    
+    @classmethod
+    def get_lyrics_location(cls) -> Optional[PurePath]:
+        return cls._snapshot().lyrics_location
     
     @classmethod
     def get_ffmpeg_log_level(cls) -> str:
@@ -505,16 +718,7 @@ class Config:
     
     @classmethod
     def get_m3u8_location(cls) -> Optional[PurePath]:
-        if cls.get(M3U8_LOCATION) == '':
-            # Use OUTPUT path as default location
-            return None
-        else:
-            m3u8_path = cls.get(M3U8_LOCATION)
-            if m3u8_path[0] == ".":
-                m3u8_path = cls.get_root_path() / PurePath(m3u8_path).relative_to(".")
-            m3u8_path = PurePath(Path(m3u8_path).expanduser())
-        
-        return m3u8_path
+        return cls._snapshot().m3u8_location
     
     @classmethod
     def get_m3u8_relative_paths(cls) -> bool:
@@ -540,22 +744,22 @@ class Config:
         return cls.get(REGEX_ENABLED)
     
     @classmethod
-    def get_regex_album(cls) -> Optional[re.Pattern]:
-        if not (cls.get_regex_enabled() and cls.get(REGEX_ALBUM_SKIP)):
+    def _compile_regex(cls, key: str) -> Optional[re.Pattern]:
+        if not (cls.get_regex_enabled() and cls.get(key)):
             return None
-        return re.compile(cls.get(REGEX_ALBUM_SKIP), re.I)
+        return re.compile(cls.get(key), re.I)
+    
+    @classmethod
+    def get_regex_album(cls) -> Optional[re.Pattern]:
+        return cls._snapshot().regex_album
     
     @classmethod
     def get_regex_track(cls) -> Optional[re.Pattern]:
-        if not (cls.get_regex_enabled() and cls.get(REGEX_TRACK_SKIP)):
-            return None
-        return re.compile(cls.get(REGEX_TRACK_SKIP), re.I)
+        return cls._snapshot().regex_track
  
     @classmethod
     def get_regex_episode(cls) -> Optional[re.Pattern]:
-        if not (cls.get_regex_enabled() and cls.get(REGEX_EPISODE_SKIP)):
-            return None
-        return re.compile(cls.get(REGEX_EPISODE_SKIP), re.I)
+        return cls._snapshot().regex_episode
     
     @classmethod
     def get_lyrics_header(cls) -> bool:
@@ -565,6 +769,29 @@ class Config:
     def get_strict_library_verify(cls) -> bool:
         return cls.get(STRICT_LIBRARY_VERIFY)
 
+    @classmethod
+    def get_tag_read_workers(cls) -> int:
+        """ Number of threads reading audio tags during library scans, 0 picks one per CPU (up to 8) """
+        workers = cls.get(TAG_READ_WORKERS)
+        if not workers or workers < 0:
+            return min(os.cpu_count() or 1, 8)
+        return workers
+    
+    @classmethod
+    def get_http_timeout(cls) -> Optional[int]:
+        timeout = cls.get(HTTP_TIMEOUT)
+        if timeout is None:
+            return int(CONFIG_VALUES[HTTP_TIMEOUT]['default'])
+        # 0 or below waits forever
+        return timeout if timeout > 0 else None
+    
+    @classmethod
+    def get_http_pool_size(cls) -> int:
+        pool_size = cls.get(HTTP_POOL_SIZE)
+        if not pool_size or pool_size < 1:
+            return int(CONFIG_VALUES[HTTP_POOL_SIZE]['default'])
+        return pool_size
+
     @classmethod
     def save(cls):
         """ Saves the current config values to the config.json file """
@@ -589,9 +816,68 @@ class Config:
         with open(full_config_path, 'w', encoding='utf-8') as config_file:
             json.dump(cls.parse_config_jsonstr(), config_file, indent=4)
 
+        cls.freeze()
+
+
+class PagedItems:
+    """
+    Items of a paginated API listing, fetched one page at a time as they are iterated.
+    
+    Only the current page (and with read_ahead, the next one, fetched in the background while the
+    current one is consumed) is held in memory. The first page is fetched on creation; len() is the
+    item count it reports, so progress bars can be sized up front. Can only be iterated once.
+    """
+    
+    def __init__(self, url: str, response_key: str = ITEMS, limit: int = 50, stripper: Optional[str] = None,
+                 offset: int = 0, read_ahead: bool = True, transform: Optional[Callable[[dict], Any]] = None):
+        self.response_key = response_key
+        self.stripper = stripper
+        self.read_ahead = read_ahead
+        self.transform = transform
+        self._first_page = self._strip(Zotify.invoke_url_with_params(url, limit=limit, offset=offset))
+        self.total: int = max(self._first_page.get('total', 0) - offset, len(self._first_page[response_key]))
+        self._items = self._iter_items()
+    
+    def __len__(self) -> int:
+        return self.total
+    
+    def __iter__(self) -> Iterator:
+        return self._items
+    
+    def _strip(self, resp: dict) -> dict:
+        return resp[self.stripper] if self.stripper is not None else resp
+    
+    def _fetch(self, url: str) -> dict:
+        (raw, resp) = Zotify.invoke_url(url)
+        return self._strip(resp)
+    
+    def pages(self) -> Iterator[list]:
+        """ Yields the items page by page """
+        resp, self._first_page = self._first_page, None
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='zotify-read-ahead') if self.read_ahead else None
+        try:
+            while resp is not None:
+                next_url = resp.get('next')
+                next_page: Optional[Future] = None
+                if next_url is not None and executor is not None:
+                    next_page = executor.submit(self._fetch, next_url)
+                items = resp[self.response_key]
+                yield [self.transform(item) for item in items] if self.transform is not None else items
+                if next_url is None:
+                    break
+                resp = next_page.result() if next_page is not None else self._fetch(next_url)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+    
+    def _iter_items(self) -> Iterator:
+        for page in self.pages():
+            yield from page
+
 
 class Zotify:    
     SESSION: Session = None
+    HTTP_SESSION: requests.Session = None
     DOWNLOAD_QUALITY = None
     TOTAL_API_CALLS = 0
     DATETIME_LAUNCH = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -599,6 +885,11 @@ class Zotify:
     USER_CONFIGURED_BULK_WAIT_TIME = None
     IS_RATE_LIMITED = False
     SUCCESSFUL_DOWNLOADS_SINCE_RATE_LIMIT = 0
+    AUTH_HEADER: Optional[dict] = None
+    AUTH_HEADER_KEY: Optional[tuple] = None
+    AUTH_HEADER_EXPIRY = 0.0
+    AUTH_REFRESH_MARGIN = 60 # seconds before token expiry to refresh proactively
+    TOKEN_FETCHES_AVOIDED = 0
     
     def __init__(self, args):
         Zotify.CONFIG.load(args)
@@ -648,6 +939,24 @@ class Zotify:
         session_builder.login_credentials = OAuth(MercuryRequests.keymaster_client_id, redirect_url, url_callback).flow()
         cls.SESSION = session_builder.create()
     
+    @classmethod
+    def get_http_session(cls) -> requests.Session:
+        """ Returns the shared keep-alive HTTP session, pooling up to HTTP_POOL_SIZE connections per host """
+        if cls.HTTP_SESSION is None:
+            pool_size = cls.CONFIG.get_http_pool_size()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            cls.HTTP_SESSION = session
+        return cls.HTTP_SESSION
+    
+    @classmethod
+    def http_get(cls, url: str, **kwargs) -> requests.Response:
+        """ GET through the shared HTTP session, applying HTTP_TIMEOUT unless a timeout is given """
+        kwargs.setdefault('timeout', cls.CONFIG.get_http_timeout())
+        return cls.get_http_session().get(url, **kwargs)
+    
     @classmethod
     def get_content_stream(cls, content_id, quality):
         if quality == 'auto':
@@ -683,17 +992,28 @@ class Zotify:
     def __get_auth_token(cls):
         return cls.SESSION.tokens().get_token(
             USER_READ_EMAIL, PLAYLIST_READ_PRIVATE, USER_LIBRARY_READ, USER_FOLLOW_READ
-        ).access_token
+        )
     
     @classmethod
     def get_auth_header(cls):
-        return {
-            'Authorization': f'Bearer {cls.__get_auth_token()}',
+        """ Returns the API request headers, reusing them until shortly before the token expires """
+        header_key = (id(cls.SESSION), cls.CONFIG.get_language())
+        if cls.AUTH_HEADER is not None and cls.AUTH_HEADER_KEY == header_key and time.time() < cls.AUTH_HEADER_EXPIRY:
+            cls.TOKEN_FETCHES_AVOIDED += 1
+            return cls.AUTH_HEADER
+        
+        token = cls.__get_auth_token()
+        # StoredToken.timestamp is in microseconds, expires_in in seconds
+        cls.AUTH_HEADER_EXPIRY = token.timestamp / 1_000_000 + token.expires_in - cls.AUTH_REFRESH_MARGIN
+        cls.AUTH_HEADER_KEY = header_key
+        cls.AUTH_HEADER = {
+            'Authorization': f'Bearer {token.access_token}',
             'Accept-Language': f'{cls.CONFIG.get_language()}',
             'Accept': 'application/json',
             'app-platform': 'WebPlayer',
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:136.0) Gecko/20100101 Firefox/136.0'
         }
+        return cls.AUTH_HEADER
     
     @classmethod
     def invoke_url(cls, url: str, _params: Optional[dict] = None, expectFail: bool = False) -> tuple[str, dict]:
@@ -701,17 +1021,23 @@ class Zotify:
         
         tryCount = 0
         while tryCount <= cls.CONFIG.get_retry_attempts():
-            response = requests.get(url, headers=headers, params=_params)
+            try:
+                response = cls.http_get(url, headers=headers, params=_params)
+            except requests.exceptions.RequestException as e:
+                response = None
+                responsetext = ""
+                responsejson = {"error": {"status": type(e).__name__, "message": str(e)}}
             cls.TOTAL_API_CALLS += 1
             
-            try:
-                responsetext = response.text
-                responsejson = response.json()
-                if not responsejson:
-                    raise json.decoder.JSONDecodeError
-                # responsejson = {"error": {"status": "Unknown", "message": "Received an empty response"}}
-            except json.decoder.JSONDecodeError:
-                responsejson = {"error": {"status": "Unknown", "message": "Received an empty response"}}
+            if response is not None:
+                try:
+                    responsetext = response.text
+                    responsejson = response.json()
+                    if not responsejson:
+                        raise json.decoder.JSONDecodeError
+                    # responsejson = {"error": {"status": "Unknown", "message": "Received an empty response"}}
+                except json.decoder.JSONDecodeError:
+                    responsejson = {"error": {"status": "Unknown", "message": "Received an empty response"}}
             
             if not responsejson or 'error' in responsejson:
                 if not expectFail: 
@@ -739,15 +1065,13 @@ class Zotify:
     
     @classmethod
     def invoke_url_nextable(cls, url: str, response_key: str = ITEMS, limit: int = 50, stripper: Optional[str] = None, offset: int = 0) -> list[dict]:
-        resp = cls.invoke_url_with_params(url, limit=limit, offset=offset)
-        if stripper is not None:
-            resp = resp[stripper]
-        items: list = resp[response_key]
+        return list(PagedItems(url, response_key, limit, stripper, offset, read_ahead=False))
         
-        while resp['next'] is not None:
-            (raw, resp) = Zotify.invoke_url(resp['next'])
-            items.extend(resp[response_key])
-        return items
+    @classmethod
+    def invoke_url_paged(cls, url: str, response_key: str = ITEMS, limit: int = 50, stripper: Optional[str] = None, offset: int = 0,
+                         read_ahead: bool = True, transform: Optional[Callable[[dict], Any]] = None) -> PagedItems:
+        """ Streaming variant of invoke_url_nextable, items are fetched page by page as they are iterated """
+        return PagedItems(url, response_key, limit, stripper, offset, read_ahead, transform)
     
     @classmethod
     def invoke_url_bulk(cls, url: str, bulk_items: list[str], stripper: str, limit: int = 50) -> list[dict]:
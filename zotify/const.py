@@ -232,6 +232,14 @@ REGEX_EPISODE_SKIP = 'REGEX_EPISODE_SKIP'
 REGEX_ALBUM_SKIP = 'REGEX_ALBUM_SKIP'
 LYRICS_MD_HEADER = 'LYRICS_MD_HEADER'
 STRICT_LIBRARY_VERIFY = 'STRICT_LIBRARY_VERIFY'
+HTTP_TIMEOUT = 'HTTP_TIMEOUT'
+HTTP_POOL_SIZE = 'HTTP_POOL_SIZE'
+CACHE_LOCATION = 'CACHE_LOCATION'
+ARTIST_CACHE_TTL = 'ARTIST_CACHE_TTL'
+PERSIST_ARTIST_CACHE = 'PERSIST_ARTIST_CACHE'
+POSTPROCESS_WORKERS = 'POSTPROCESS_WORKERS'
+TAG_READ_WORKERS = 'TAG_READ_WORKERS'
+SKIP_UNCHANGED_PLAYLISTS = 'SKIP_UNCHANGED_PLAYLISTS'
 
 # Custom Exceptions
 class AudioKeyError(Exception):
@@ -16,20 +16,49 @@ from PyQt5.QtWidgets import QDialog
 from pathlib import Path
 from .main_window import Ui_MainWindow
 from .login_dialog import Ui_LoginDialog
-from .worker import Worker, MusicSignals
+from .worker import Worker, MusicSignals, LibrarySignals
+from .models import LibraryModel, RowStore, liked_songs_store, playlists_store, playlist_items_store, local_songs_store, local_song_row
 import qdarktheme
 from .view import set_button_icon, set_label_image
 import webbrowser
 from librespot.core import Session
 from zotify.config import Zotify
+from zotify.cache import DirectoryCache
+from zotify.watcher import LibraryWatcher
 from zotify import api
 from zotify.track import download_track
 from zotify.album import download_album
 from zotify.playlist import download_playlist
 from zotify.gui.settings_dialog import SettingsDialog
-from datetime import datetime
-from zotify.playlist import get_playlist_full_items
-from zotify.const import TRACK, ID
+from zotify.const import ID
+
+FILTER_DELAY = 150  # ms
+
+
+def fetch_local_songs(root_path):
+    return local_songs_store(api.get_local_songs(root_path))
+
+
+def fetch_liked_songs(show_cached):
+    """ Shows the cached liked songs right away, then returns a store of the synced ones or None if unchanged """
+    cached = api.get_cached_liked_songs()
+    if cached:
+        show_cached(liked_songs_store(cached))
+    songs = api.sync_liked_songs(cached)
+    return liked_songs_store(songs) if songs is not None else None
+
+
+def fetch_user_playlists(show_cached):
+    cached = api.get_cached_user_playlists()
+    if cached:
+        show_cached(playlists_store(cached))
+    playlists = api.sync_user_playlists(cached)
+    return playlists_store(playlists) if playlists is not None else None
+
+
+def fetch_playlist_items(playlist_id, snapshot_id):
+    return playlist_items_store(api.get_playlist_items(playlist_id, snapshot_id))
+
 
 def main():
     app = QApplication(sys.argv)
@@ -50,6 +79,7 @@ class Window(QMainWindow, Ui_MainWindow):
         set_label_image(self.coverArtLabel, "Resources/cover_default.jpg")
         self.logged_in = False
         self.selected_item = None
+        self.selected_local_path = None
         self.results = {}
         self.reconnecting = False
         self.load_config()
@@ -72,9 +102,18 @@ class Window(QMainWindow, Ui_MainWindow):
         # Hide info view by default
         self.infoView.hide()
 
+        # Library tabs are views over models filled from worker threads, rows are fetched as they scroll in
+        self.downloadedModel = LibraryModel(["Title", "Artists", "Album"], key_field='path', parent=self)
+        self.downloadedTree.setModel(self.downloadedModel)
+        self.downloadedTree.setUniformRowHeights(True)
+        self.downloadedTree.setSortingEnabled(True)
+        self.likedModel = LibraryModel(["Name", "Artist", "Album", "Added Date", "Release Date"], parent=self)
+        self.likedTree.setModel(self.likedModel)
+        self.likedTree.setUniformRowHeights(True)
+        
         # Connect item selection changes to show info view
-        self.downloadedTree.itemSelectionChanged.connect(self.on_item_selection_changed)
-        self.likedTree.itemSelectionChanged.connect(self.on_item_selection_changed)
+        self.downloadedTree.selectionModel().selectionChanged.connect(self.on_item_selection_changed)
+        self.likedTree.selectionModel().selectionChanged.connect(self.on_item_selection_changed)
         self.songsTree.itemSelectionChanged.connect(self.on_item_selection_changed)
         self.albumsTree.itemSelectionChanged.connect(self.on_item_selection_changed)
         self.artistsTree.itemSelectionChanged.connect(self.on_item_selection_changed)
@@ -90,10 +129,9 @@ class Window(QMainWindow, Ui_MainWindow):
         self.likedSearch = QLineEdit()
         self.likedSearch.setPlaceholderText("Search liked songs...")
         self.likedTab.layout().insertWidget(0, self.likedSearch)
-        self.likedSearch.textChanged.connect(self.filter_liked_songs)
+        self.debounce_filter(self.likedSearch, self.filter_liked_songs)
 
-        # Set headers and sorting for likedTree
-        self.likedTree.setHeaderLabels(["Name", "Artist", "Album", "Added Date", "Release Date"])
+        # Set sorting for likedTree
         self.likedTree.setSortingEnabled(True)
 
         # Playlists tab setup
@@ -104,11 +142,13 @@ class Window(QMainWindow, Ui_MainWindow):
         self.playlistsSearch = QLineEdit()
         self.playlistsSearch.setPlaceholderText("Search playlists and songs...")
         playlists_layout.addWidget(self.playlistsSearch)
-        self.playlistsSearch.textChanged.connect(self.filter_user_playlists)
+        self.debounce_filter(self.playlistsSearch, self.filter_user_playlists)
 
-        self.userPlaylistsTree = QtWidgets.QTreeWidget(self.playlistsTab)
+        self.userPlaylistsTree = QtWidgets.QTreeView(self.playlistsTab)
         self.userPlaylistsTree.setObjectName("userPlaylistsTree")
-        self.userPlaylistsTree.setHeaderLabels(["Name", "Owner", "Tracks", "Added Date", "Release Date"])
+        self.userPlaylistsModel = LibraryModel(["Name", "Owner", "Tracks", "Added Date", "Release Date"], expandable=True, parent=self)
+        self.userPlaylistsTree.setModel(self.userPlaylistsModel)
+        self.userPlaylistsTree.setUniformRowHeights(True)
         self.userPlaylistsTree.setSortingEnabled(True)
         playlists_layout.addWidget(self.userPlaylistsTree)
 
@@ -125,19 +165,37 @@ class Window(QMainWindow, Ui_MainWindow):
         self.playlistSpecificSearch.setPlaceholderText("Search in selected playlist...")
         self.playlistSpecificSearch.hide()  # Hidden by default
         playlists_layout.addWidget(self.playlistSpecificSearch)
-        self.playlistSpecificSearch.textChanged.connect(self.filter_selected_playlist)
+        self.debounce_filter(self.playlistSpecificSearch, self.filter_selected_playlist)
 
         self.libraryTabs.addTab(self.playlistsTab, "Your Playlists")
 
-        self.userPlaylistsTree.itemExpanded.connect(self.on_playlist_expanded)
-        self.userPlaylistsTree.itemSelectionChanged.connect(self.on_item_selection_changed)
-        self.userPlaylistsTree.itemDoubleClicked.connect(self.on_playlist_double_clicked)
+        self.userPlaylistsTree.expanded.connect(self.on_playlist_expanded)
+        self.userPlaylistsTree.selectionModel().selectionChanged.connect(self.on_item_selection_changed)
 
         # Caches
         self.user_playlists_cache = None
+        self.loading_playlists = set()
+        self.filter_mode = None
 
         # Connect item selection changes to show/hide specific search
-        self.userPlaylistsTree.itemSelectionChanged.connect(self.on_playlist_selection_changed)
+        self.userPlaylistsTree.selectionModel().selectionChanged.connect(self.on_playlist_selection_changed)
+        
+        # Downloaded songs are scanned once, then kept live by a watcher on the root path
+        self.downloaded_root = None
+        self.library_watcher = None
+        self.library_signals = LibrarySignals()
+        self.library_signals.changed.connect(self.on_library_changed)
+        # watcher batches are applied in the order they were seen, one at a time
+        self.library_pool = QThreadPool()
+        self.library_pool.setMaxThreadCount(1)
+    
+    def debounce_filter(self, line_edit, slot):
+        """ Calls slot with the search text once typing has paused for FILTER_DELAY ms """
+        timer = QtCore.QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(FILTER_DELAY)
+        timer.timeout.connect(lambda: slot(line_edit.text()))
+        line_edit.textChanged.connect(lambda text: timer.start())
 
     def on_refresh_liked_clicked(self):
         self.liked_songs_cache = None
@@ -148,22 +206,27 @@ class Window(QMainWindow, Ui_MainWindow):
         current_music_tab = self.musicTabs.currentWidget()
         if current_music_tab.objectName() == 'libraryLayout':
             current_library_tab = self.libraryTabs.currentWidget()
-            return current_library_tab.findChild(QtWidgets.QTreeWidget)
+            return current_library_tab.findChild(QtWidgets.QTreeView)
         elif current_music_tab.objectName() == 'resultLayout':
             current_search_tab = self.searchTabs.currentWidget()
-            return current_search_tab.findChild(QtWidgets.QTreeWidget)
+            return current_search_tab.findChild(QtWidgets.QTreeView)
         return None
+    
+    @staticmethod
+    def selected_data(tree):
+        # works for QTreeWidgets and model backed views alike, both keep the row data in UserRole
+        return [index.data(QtCore.Qt.UserRole) for index in tree.selectionModel().selectedRows()]
 
     def on_item_selection_changed(self):
         tree = self.get_current_tree_widget()
-        if tree and tree.selectedItems():
+        selected = self.selected_data(tree) if tree else []
+        if selected:
             self.infoView.show()
-            self.update_info_panel(tree.selectedItems()[0])
+            self.update_info_panel(selected[0])
         else:
             self.infoView.hide()
 
-    def update_info_panel(self, item):
-        data = item.data(0, QtCore.Qt.UserRole)
+    def update_info_panel(self, data):
         if not data:
             return
 
@@ -171,6 +234,7 @@ class Window(QMainWindow, Ui_MainWindow):
         for i in range(len(self.info_labels)):
             self.info_labels[i].setText("")
             self.info_headers[i].setText("")
+        self.selected_local_path = None
 
         item_type = data.get('type')
 
@@ -198,13 +262,12 @@ class Window(QMainWindow, Ui_MainWindow):
             self.infoHeader4.setText("Path:")
             self.infoLabel4.setText(data.get('path', 'N/A'))
 
-            image_data = data.get('image_data')
-            if image_data:
-                pixmap = QPixmap()
-                pixmap.loadFromData(image_data)
-                self.coverArtLabel.setPixmap(pixmap.scaled(self.coverArtLabel.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
-            else:
-                set_label_image(self.coverArtLabel, "Resources/cover_default.jpg")
+            # artwork is not kept in the scan results, read it from the file only once the row is selected
+            self.selected_local_path = data.get('path')
+            worker = Worker(api.get_local_artwork, data.get('path'))
+            worker.signals.result.connect(lambda image_data, path=data.get('path'): self.display_local_artwork(path, image_data))
+            worker.signals.error.connect(lambda error, path=data.get('path'): self.display_local_artwork(path, None))
+            QThreadPool.globalInstance().start(worker)
 
         elif item_type == 'album':
             self.infoHeader1.setText("Album:")
@@ -265,6 +328,16 @@ class Window(QMainWindow, Ui_MainWindow):
                 if image_url:
                     worker = Worker(set_label_image, self.coverArtLabel, image_url, from_url=True)
                     QThreadPool.globalInstance().start(worker)
+    
+    def display_local_artwork(self, path, image_data):
+        if path != self.selected_local_path:
+            return  # another row was selected in the meantime
+        if image_data:
+            pixmap = QPixmap()
+            pixmap.loadFromData(image_data)
+            self.coverArtLabel.setPixmap(pixmap.scaled(self.coverArtLabel.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
+        else:
+            set_label_image(self.coverArtLabel, "Resources/cover_default.jpg")
 
     def on_library_tab_changed(self, index):
         if index == 0:  # Downloaded Songs Tab
@@ -275,22 +348,50 @@ class Window(QMainWindow, Ui_MainWindow):
             self.load_user_playlists()
 
     def load_downloaded_songs(self):
-        self.downloadedTree.clear()
         root_path = Zotify.CONFIG.get_root_path()
-        worker = Worker(api.get_local_songs, root_path)
-        worker.signals.result.connect(self.display_downloaded_songs)
+        if self.library_watcher is not None and self.downloaded_root == root_path:
+            return  # the view is kept up to date by the watcher
+        self.stop_library_watcher()
+        self.downloaded_root = root_path
+        self.downloadedModel.clear()
+        worker = Worker(fetch_local_songs, root_path)
+        worker.signals.result.connect(lambda store, root_path=root_path: self.display_downloaded_songs(store, root_path))
         worker.signals.error.connect(self.search_error) # Can reuse search_error for now
         QThreadPool.globalInstance().start(worker)
 
-    def display_downloaded_songs(self, results):
-        for song in results:
-            artists = ", ".join(song['artists'])
-            item = QTreeWidgetItem([song['name'], artists, song['album']])
-            item.setData(0, QtCore.Qt.UserRole, song)
-            self.downloadedTree.addTopLevelItem(item)
+    def display_downloaded_songs(self, store, root_path):
+        if root_path != self.downloaded_root:
+            return  # superseded by a scan of another root path
+        self.downloadedModel.set_store(store)
+        self.library_watcher = LibraryWatcher(root_path, self.library_signals.changed.emit,
+                                              known={Path(path) for path in self.downloadedModel.keys()})
+        self.library_watcher.start()
+    
+    def on_library_changed(self, changes):
+        # tags of new or modified files are read off the UI thread
+        root_path = self.downloaded_root
+        worker = Worker(api.apply_local_changes, changes)
+        worker.signals.result.connect(lambda result, root_path=root_path: self.apply_downloaded_changes(result, root_path))
+        self.library_pool.start(worker)
+    
+    def apply_downloaded_changes(self, result, root_path):
+        if root_path != self.downloaded_root:
+            return
+        songs, removed = result
+        self.downloadedModel.remove_keys(removed)
+        self.downloadedModel.upsert_rows([local_song_row(song) for song in songs])
+    
+    def stop_library_watcher(self):
+        if self.library_watcher is not None:
+            self.library_watcher.stop()
+            self.library_watcher = None
+    
+    def closeEvent(self, event):
+        self.stop_library_watcher()
+        super().closeEvent(event)
 
     def load_liked_songs(self):
-        self.likedTree.clear()
+        self.likedModel.clear()
 
         if self.liked_songs_cache is not None:
             self.display_liked_songs(self.liked_songs_cache)
@@ -301,29 +402,24 @@ class Window(QMainWindow, Ui_MainWindow):
         self.loadingLikedLabel.show()
         self.refresh_liked_btn.setEnabled(False)
 
-        worker = Worker(api.get_liked_songs)
-        worker.signals.result.connect(self.display_liked_songs)
+        worker = Worker(fetch_liked_songs, update=self.display_liked_songs)
+        worker.signals.result.connect(self.on_liked_songs_synced)
         worker.signals.error.connect(self.display_liked_songs_error)
         QThreadPool.globalInstance().start(worker)
 
-    def display_liked_songs(self, results):
-        self.liked_songs_cache = results
+    def display_liked_songs(self, store):
+        self.liked_songs_cache = store
         self.loadingLikedLabel.hide()
         self.likedTree.show()
+        self.likedModel.set_store(store)
+    
+    def on_liked_songs_synced(self, store):
+        # refreshing stays disabled while the cached songs are shown, until their sync ends
         self.refresh_liked_btn.setEnabled(True)
-        self.likedTree.clear()
-        for track_item in results:
-            track = track_item['track']
-            artists = ", ".join([artist['name'] for artist in track['artists']])
-            added_at_str = datetime.fromisoformat(track_item['added_at'].replace('Z', '+00:00')).strftime('%Y-%m-%d')
-            release_date = track['album'].get('release_date', 'Unknown')
-            if release_date and len(release_date) >= 4:
-                release_date = release_date[:4]
-            else:
-                release_date = ''
-            item = QTreeWidgetItem([track['name'], artists, track['album']['name'], added_at_str, release_date])
-            item.setData(0, QtCore.Qt.UserRole, {'type': 'track', **track, 'added_at': track_item['added_at']})
-            self.likedTree.addTopLevelItem(item)
+        if store is not None:
+            self.display_liked_songs(store)
+        elif self.liked_songs_cache is None:  # nothing cached and nothing liked
+            self.display_liked_songs(RowStore(len(self.likedModel.headers)))
 
     def display_liked_songs_error(self, error):
         self.loadingLikedLabel.setText("Error loading liked songs. Please try again later.")
@@ -455,29 +551,28 @@ class Window(QMainWindow, Ui_MainWindow):
     def on_download_selected_clicked(self):
         active_tab_widget = self.musicTabs.currentWidget()
         if active_tab_widget.objectName() == 'resultLayout':
-            tree_widget = self.searchTabs.currentWidget().findChild(QtWidgets.QTreeWidget)
+            tree_widget = self.searchTabs.currentWidget().findChild(QtWidgets.QTreeView)
         elif active_tab_widget.objectName() == 'libraryLayout':
-            tree_widget = self.libraryTabs.currentWidget().findChild(QtWidgets.QTreeWidget)
+            tree_widget = self.libraryTabs.currentWidget().findChild(QtWidgets.QTreeView)
         else:  # queue or others
             return
 
         if not tree_widget:
             return
 
-        selected_items = tree_widget.selectedItems()
-        if not selected_items:
+        selected_data = self.selected_data(tree_widget)
+        if not selected_data:
             return
 
         self.progressBar.show()
         self.stopBtn.show()
         self.progressBar.setValue(0)
 
-        self.download_queue = []
-        for item in selected_items:
-            self.download_queue.append(item.data(0, QtCore.Qt.UserRole))
+        self.download_queue = selected_data
 
         self.total_downloads = len(self.download_queue)
         self.completed_downloads = 0
+        DirectoryCache.clear()
         self.start_next_download()
 
     def start_next_download(self):
@@ -530,18 +625,14 @@ class Window(QMainWindow, Ui_MainWindow):
                              self.infoHeader6]
 
     def filter_liked_songs(self, text):
-        text = text.lower()
-        for i in range(self.likedTree.topLevelItemCount()):
-            item = self.likedTree.topLevelItem(i)
-            visible = any(text in str(item.text(c)).lower() for c in range(item.columnCount()))
-            item.setHidden(not visible)
+        self.likedModel.set_filter(text)
 
     def on_refresh_playlists_clicked(self):
         self.user_playlists_cache = None
         self.load_user_playlists()
 
     def load_user_playlists(self):
-        self.userPlaylistsTree.clear()
+        self.userPlaylistsModel.clear()
 
         if self.user_playlists_cache is not None:
             self.display_user_playlists(self.user_playlists_cache)
@@ -552,100 +643,62 @@ class Window(QMainWindow, Ui_MainWindow):
         self.loadingPlaylistsLabel.show()
         self.refresh_playlists_btn.setEnabled(False)
 
-        from zotify import api
-        worker = Worker(api.get_user_playlists)
-        worker.signals.result.connect(self.display_user_playlists)
+        worker = Worker(fetch_user_playlists, update=self.display_user_playlists)
+        worker.signals.result.connect(self.on_user_playlists_synced)
         worker.signals.error.connect(self.on_playlists_error)
         QThreadPool.globalInstance().start(worker)
 
-    def display_user_playlists(self, playlists):
-        self.user_playlists_cache = playlists
+    def display_user_playlists(self, store):
+        self.user_playlists_cache = store
         self.loadingPlaylistsLabel.hide()
         self.userPlaylistsTree.show()
-        self.refresh_playlists_btn.setEnabled(True)
-        self.userPlaylistsTree.clear()
-        for playlist in playlists:
-            owner = playlist['owner']['display_name']
-            total = str(playlist['tracks']['total'])
-            item = QTreeWidgetItem([playlist['name'], owner, total, '', ''])
-            item.setData(0, QtCore.Qt.UserRole, {'type': 'playlist', **playlist})
-            item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
-            self.userPlaylistsTree.addTopLevelItem(item)
+        self.loading_playlists.clear()
+        self.userPlaylistsModel.set_store(store)
 
+    def on_user_playlists_synced(self, store):
+        self.refresh_playlists_btn.setEnabled(True)
+        if store is not None:
+            self.display_user_playlists(store)
+        elif self.user_playlists_cache is None:
+            self.display_user_playlists(RowStore(len(self.userPlaylistsModel.headers)))
+    
     def on_playlists_error(self, error):
         self.loadingPlaylistsLabel.setText("Error loading playlists. Please try again later.")
         self.refresh_playlists_btn.setEnabled(True)
         print("Error loading playlists:", error)
 
-    def on_playlist_expanded(self, item):
-        if item.childCount() > 0:
+    def on_playlist_expanded(self, index):
+        if index.parent().isValid():
             return
-        playlist_data = item.data(0, QtCore.Qt.UserRole)
-        playlist_id = playlist_data['id']
-        from zotify.playlist import get_playlist_full_items
-        worker = Worker(get_playlist_full_items, playlist_id)
-        worker.signals.result.connect(lambda res: self.display_playlist_songs(item, res))
-        worker.signals.error.connect(lambda e: print("Error loading playlist songs:", e))
+        payload = index.data(QtCore.Qt.UserRole)
+        playlist_id = payload[ID]
+        if self.userPlaylistsModel.has_children(playlist_id) or playlist_id in self.loading_playlists:
+            return
+        self.loading_playlists.add(playlist_id)
+        worker = Worker(fetch_playlist_items, playlist_id, payload.get('snapshot_id'))
+        worker.signals.result.connect(lambda store, playlist_id=playlist_id: self.display_playlist_songs(playlist_id, store))
+        worker.signals.error.connect(lambda e, playlist_id=playlist_id: self.on_playlist_songs_error(playlist_id, e))
         QThreadPool.globalInstance().start(worker)
 
-    def display_playlist_songs(self, parent_item, full_items):
-        for full_item in full_items:
-            added_at_str = datetime.fromisoformat(full_item['added_at'].replace('Z', '+00:00')).strftime('%Y-%m-%d')
-            if full_item.get(TRACK) and full_item[TRACK].get(ID):
-                track = full_item[TRACK]
-                item_type = 'track'
-                artists = ", ".join([artist['name'] for artist in track.get('artists', []) if artist is not None])
-                album = track['album']['name']
-                release_date = track['album'].get('release_date', 'Unknown')
-                if release_date and len(release_date) >= 4:
-                    release_date = release_date[:4]
-                else:
-                    release_date = ''
-                child = QTreeWidgetItem([track['name'], artists, album, added_at_str, release_date])
-                child.setData(0, QtCore.Qt.UserRole, {'type': item_type, **track, 'added_at': full_item['added_at']})
-            elif full_item.get('episode') and full_item['episode'].get(ID):
-                episode = full_item['episode']
-                item_type = 'episode'
-                show = episode.get('show', {}).get('name', 'Unknown Show')
-                description_snippet = episode.get('description', '')[:50] + '...' if len(episode.get('description', '')) > 50 else episode.get('description', '')
-                release_date = episode.get('release_date', 'Unknown')
-                if release_date and len(release_date) >= 4:
-                    release_date = release_date[:4]
-                else:
-                    release_date = ''
-                child = QTreeWidgetItem([episode['name'], show, description_snippet, added_at_str, release_date])
-                child.setData(0, QtCore.Qt.UserRole, {'type': item_type, **episode, 'added_at': full_item['added_at']})
-            else:
-                continue
-            parent_item.addChild(child)
+    def display_playlist_songs(self, playlist_id, store):
+        if playlist_id not in self.loading_playlists:
+            return  # the playlists were reloaded in the meantime
+        self.loading_playlists.discard(playlist_id)
+        self.userPlaylistsModel.set_children(playlist_id, store)
+    
+    def on_playlist_songs_error(self, playlist_id, error):
+        self.loading_playlists.discard(playlist_id)
+        print("Error loading playlist songs:", error)
 
     def filter_user_playlists(self, text):
-        text = text.lower()
-        def is_visible(item):
-            match = any(text in str(item.text(c)).lower() for c in range(item.columnCount()))
-            has_visible_child = False
-            for child_idx in range(item.childCount()):
-                child = item.child(child_idx)
-                if is_visible(child):
-                    has_visible_child = True
-                    child.setHidden(False)
-            item.setHidden(not (match or has_visible_child))
-            return match or has_visible_child
-        for i in range(self.userPlaylistsTree.topLevelItemCount()):
-            is_visible(self.userPlaylistsTree.topLevelItem(i))
-
-    def on_playlist_double_clicked(self, item, column):
-        if item.childCount() > 0:
-            # Already expanded: collapse it
-            item.setExpanded(False)
-        else:
-            # Not expanded: expand and load if needed
-            item.setExpanded(True)
+        # playlists shown only because some of their songs match are expanded to show them
+        for key in self.userPlaylistsModel.set_filter(text):
+            self.userPlaylistsTree.expand(self.userPlaylistsModel.index_of(key))
 
     def on_playlist_selection_changed(self):
-        selected = self.userPlaylistsTree.selectedItems()
-        if selected and selected[0].parent() is None:  # Top-level playlist selected
-            self.filter_mode = selected[0]
+        selected = self.userPlaylistsTree.selectionModel().selectedRows()
+        if selected and not selected[0].parent().isValid():  # Top-level playlist selected
+            self.filter_mode = selected[0].data(QtCore.Qt.UserRole)[ID]
             self.playlistSpecificSearch.show()
         else:
             self.filter_mode = None
@@ -655,13 +708,8 @@ class Window(QMainWindow, Ui_MainWindow):
     def filter_selected_playlist(self, text):
         if not self.filter_mode:
             return
-        text = text.lower()
-        # Filter only children of self.filter_mode
-        for i in range(self.filter_mode.childCount()):
-            child = self.filter_mode.child(i)
-            visible = any(text in str(child.text(c)).lower() for c in range(child.columnCount()))
-            child.setHidden(not visible)
-        # Hide/show parent based on children, but since parent is always visible when selected, no need
+        # Filter only children of the selected playlist
+        self.userPlaylistsModel.set_child_filter(self.filter_mode, text)
 
 
 class LoginDialog(QDialog, Ui_LoginDialog):
@@ -122,12 +122,11 @@ class Ui_MainWindow(object):
         self.verticalLayout_16 = QtWidgets.QVBoxLayout(self.downloadedTab)
         self.verticalLayout_16.setContentsMargins(3, 0, 3, 3)
         self.verticalLayout_16.setObjectName("verticalLayout_16")
-        self.downloadedTree = QtWidgets.QTreeWidget(self.downloadedTab)
+        self.downloadedTree = QtWidgets.QTreeView(self.downloadedTab)
         self.downloadedTree.setAlternatingRowColors(True)
         self.downloadedTree.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.downloadedTree.setAnimated(True)
         self.downloadedTree.setObjectName("downloadedTree")
-        self.downloadedTree.headerItem().setText(0, "Title")
         self.downloadedTree.header().setDefaultSectionSize(270)
         self.downloadedTree.header().setMinimumSectionSize(15)
         self.verticalLayout_16.addWidget(self.downloadedTree)
@@ -137,12 +136,11 @@ class Ui_MainWindow(object):
         self.verticalLayout_17 = QtWidgets.QVBoxLayout(self.likedTab)
         self.verticalLayout_17.setContentsMargins(3, 0, 3, 3)
         self.verticalLayout_17.setObjectName("verticalLayout_17")
-        self.likedTree = QtWidgets.QTreeWidget(self.likedTab)
+        self.likedTree = QtWidgets.QTreeView(self.likedTab)
         self.likedTree.setAlternatingRowColors(True)
         self.likedTree.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.likedTree.setAnimated(True)
         self.likedTree.setObjectName("likedTree")
-        self.likedTree.headerItem().setText(0, "1")
         self.likedTree.header().setDefaultSectionSize(270)
         self.likedTree.header().setMinimumSectionSize(15)
         self.verticalLayout_17.addWidget(self.likedTree)
@@ -437,8 +435,6 @@ class Ui_MainWindow(object):
         self.loginBtn.setToolTip(_translate("MainWindow", "Login to your Spotify account or logout"))
         self.loginBtn.setText(_translate("MainWindow", "Login"))
         self.downloadedTree.setSortingEnabled(True)
-        self.downloadedTree.headerItem().setText(1, _translate("MainWindow", "Artists"))
-        self.downloadedTree.headerItem().setText(2, _translate("MainWindow", "Album"))
         self.libraryTabs.setTabText(self.libraryTabs.indexOf(self.downloadedTab), _translate("MainWindow", "Downloaded"))
         self.likedTree.setSortingEnabled(True)
         self.libraryTabs.setTabText(self.libraryTabs.indexOf(self.likedTab), _translate("MainWindow", "Liked"))
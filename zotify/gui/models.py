@@ -0,0 +1,529 @@
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import datetime
+from PyQt5.QtCore import QAbstractItemModel, QModelIndex, Qt
+from zotify.const import ID, NAME, TRACK
+
+FETCH_BATCH = 256
+
+
+def normalize_search(text):
+    """ Casefolds text and strips accents, so 'Beyonce' finds 'Beyoncé' """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def search_text(texts):
+    return normalize_search('\x1f'.join(texts))
+
+
+def search_tokens(text):
+    return normalize_search(text or '').split()
+
+
+def format_added_at(added_at):
+    if not added_at:
+        return ''
+    return datetime.fromisoformat(added_at.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+
+
+def release_year(release_date):
+    if release_date and len(release_date) >= 4:
+        return release_date[:4]
+    return ''
+
+
+def slim_track(track, added_at=None):
+    """ Keeps only the track fields read by the info panel and downloads """
+    album = track.get('album') or {}
+    return {
+        'type': 'track',
+        ID: track[ID],
+        NAME: track.get(NAME, ''),
+        'artists': [{NAME: artist[NAME]} for artist in track.get('artists', []) if artist is not None],
+        'album': {NAME: album.get(NAME, ''), 'images': album.get('images', [])[:1],
+                  'release_date': album.get('release_date', '')},
+        'added_at': added_at,
+    }
+
+
+def slim_episode(episode, added_at=None):
+    show = episode.get('show') or {}
+    return {
+        'type': 'episode',
+        ID: episode[ID],
+        NAME: episode.get(NAME, ''),
+        'show': {NAME: show.get(NAME, 'Unknown Show'), 'images': show.get('images', [])[:1]},
+        'description': episode.get('description', ''),
+        'release_date': episode.get('release_date', ''),
+        'added_at': added_at,
+    }
+
+
+def slim_playlist(playlist):
+    return {
+        'type': 'playlist',
+        ID: playlist[ID],
+        NAME: playlist.get(NAME, ''),
+        'owner': {'display_name': (playlist.get('owner') or {}).get('display_name', '')},
+        'tracks': {'total': (playlist.get('tracks') or {}).get('total', 0)},
+        'images': (playlist.get('images') or [])[:1],
+        'snapshot_id': playlist.get('snapshot_id'),
+    }
+
+
+def track_row(track, added_at=None):
+    payload = slim_track(track, added_at)
+    artists = ", ".join(artist[NAME] for artist in payload['artists'])
+    return [payload[NAME], artists, payload['album'][NAME], format_added_at(added_at),
+            release_year(payload['album']['release_date'])], payload
+
+
+def episode_row(episode, added_at=None):
+    payload = slim_episode(episode, added_at)
+    description = payload['description']
+    description_snippet = description[:50] + '...' if len(description) > 50 else description
+    return [payload[NAME], payload['show'][NAME], description_snippet, format_added_at(added_at),
+            release_year(payload['release_date'])], payload
+
+
+def playlist_row(playlist):
+    payload = slim_playlist(playlist)
+    return [payload[NAME], payload['owner']['display_name'], str(payload['tracks']['total']), '', ''], payload
+
+
+def local_song_row(song):
+    return [song['name'], ", ".join(song['artists']), song['album']], song
+
+
+def liked_songs_store(items):
+    store = RowStore(5)
+    for item in items:
+        if item.get(TRACK) and item[TRACK].get(ID):
+            store.append(*track_row(item[TRACK], item.get('added_at')))
+    return store
+
+
+def playlists_store(playlists):
+    store = RowStore(5)
+    for playlist in playlists:
+        if playlist and playlist.get(ID):
+            store.append(*playlist_row(playlist))
+    return store
+
+
+def playlist_items_store(full_items):
+    store = RowStore(5)
+    for full_item in full_items:
+        if full_item.get(TRACK) and full_item[TRACK].get(ID):
+            store.append(*track_row(full_item[TRACK], full_item.get('added_at')))
+        elif full_item.get('episode') and full_item['episode'].get(ID):
+            store.append(*episode_row(full_item['episode'], full_item.get('added_at')))
+    return store
+
+
+def local_songs_store(songs):
+    store = RowStore(3)
+    for song in songs:
+        store.append(*local_song_row(song))
+    return store
+
+
+class RowStore:
+    """
+    Rows kept column-wise: one list of display strings per column and a slim payload per row,
+    plus the normalized text of each row for filtering.
+
+    Views see the rows passing the filter (`visible`, all rows if None) and of those only the
+    first `fetched`, the rest are handed out by fetchMore.
+    """
+
+    def __init__(self, column_count):
+        self.columns = [[] for _ in range(column_count)]
+        self.payloads = []
+        self.search = []
+        self.visible = None
+        self.tokens = []
+        self.fetched = 0
+        self.key = None  # key of the parent row for child stores
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def append(self, texts, payload):
+        for column, text in zip(self.columns, texts):
+            column.append(text)
+        self.payloads.append(payload)
+        self.search.append(search_text(texts))
+
+    def insert(self, row, texts, payload):
+        for column, text in zip(self.columns, texts):
+            column.insert(row, text)
+        self.payloads.insert(row, payload)
+        self.search.insert(row, search_text(texts))
+        if self.visible is not None:
+            self.visible = [visible_row + (visible_row >= row) for visible_row in self.visible]
+            if self.matches(row, self.tokens):
+                insort(self.visible, row)
+
+    def set_row(self, row, texts, payload):
+        for column, text in zip(self.columns, texts):
+            column[row] = text
+        self.payloads[row] = payload
+        self.search[row] = search_text(texts)
+
+    def remove(self, row):
+        for column in self.columns:
+            del column[row]
+        del self.payloads[row]
+        del self.search[row]
+        if self.visible is not None:
+            self.visible = [visible_row - (visible_row > row) for visible_row in self.visible if visible_row != row]
+
+    # Rows as seen by views
+    def row_count(self):
+        return len(self) if self.visible is None else len(self.visible)
+
+    def store_row(self, row):
+        return row if self.visible is None else self.visible[row]
+
+    def view_row(self, row):
+        """ Returns the view row of a store row, None if it is filtered out """
+        if self.visible is None:
+            return row
+        position = bisect_left(self.visible, row)
+        return position if position < len(self.visible) and self.visible[position] == row else None
+
+    # Filtering
+    def matches(self, row, tokens):
+        return all(token in self.search[row] for token in tokens)
+
+    def filter(self, tokens, keep=()):
+        """ Shows only rows containing every token, and the rows in keep """
+        if not tokens:
+            self.visible = None
+            self.tokens = []
+            return
+        # a query that only narrows the previous one can start from its matches
+        narrows = self.visible is not None and self.tokens and \
+                  all(any(old in token for token in tokens) for old in self.tokens)
+        rows = self.visible if narrows else range(len(self))
+        search = self.search
+        for token in tokens:
+            rows = [row for row in rows if token in search[row]]
+        self.visible = sorted(set(rows).union(keep)) if keep else rows
+        self.tokens = list(tokens)
+
+    # Sorting
+    def sort_order(self, column, reverse=False):
+        """ Returns the rows in the order that sorts them by a column """
+        values = self.columns[column]
+        return sorted(range(len(values)), key=values.__getitem__, reverse=reverse)
+
+    def reorder(self, order, new_rows):
+        """ Puts the rows in order, new_rows being the inverse of order """
+        self.columns = [[texts[row] for row in order] for texts in self.columns]
+        self.payloads = [self.payloads[row] for row in order]
+        self.search = [self.search[row] for row in order]
+        if self.visible is not None:
+            self.visible = sorted(new_rows[row] for row in self.visible)
+
+    def insert_position(self, column, text, reverse=False):
+        """ Row at which text keeps the store sorted by column """
+        values = self.columns[column]
+        lo, hi = 0, len(values)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (values[mid] >= text) if reverse else (values[mid] <= text):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def inverse_order(order):
+    new_rows = [0] * len(order)
+    for new_row, old_row in enumerate(order):
+        new_rows[old_row] = new_row
+    return new_rows
+
+
+class LibraryModel(QAbstractItemModel):
+    """
+    Model over a RowStore, keyed by one payload field. Expandable models show every top-level row
+    with an expander and hold a child RowStore per row once set_children() has been called.
+
+    Filtering works like a QSortFilterProxyModel built into the model: rows are matched against
+    the stores' precomputed search text, so views never call back into Python per row and rows
+    not fetched yet are filtered too.
+    """
+
+    def __init__(self, headers, key_field=ID, expandable=False, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.key_field = key_field
+        self.expandable = expandable
+        self.store = RowStore(len(headers))
+        self.children = {}
+        self._row_of = {}
+        self._sort = None
+        self._tokens = []
+        self._fetching = False
+
+    def _index_keys(self):
+        self._row_of = {payload[self.key_field]: row for row, payload in enumerate(self.store.payloads)}
+
+    def _store_for(self, parent):
+        if not parent.isValid():
+            return self.store
+        if self.expandable and parent.internalPointer() is None:
+            return self.children.get(self.store.payloads[self.store.store_row(parent.row())][self.key_field])
+        return None
+
+    def _create_index(self, row, column, store=None):
+        # top-level indexes carry no pointer, passing None would store a pointer to the None object
+        return self.createIndex(row, column) if store is None else self.createIndex(row, column, store)
+
+    def _store_of(self, index):
+        store = index.internalPointer()
+        return self.store if store is None else store
+
+    # QAbstractItemModel interface
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column)
+        return self.createIndex(row, column, self._store_for(parent))
+
+    def parent(self, index):
+        if not index.isValid() or index.internalPointer() is None:
+            return QModelIndex()
+        row = self._row_of.get(index.internalPointer().key)
+        row = self.store.view_row(row) if row is not None else None
+        if row is None or row >= self.store.fetched:
+            return QModelIndex()
+        return self.createIndex(row, 0)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        store = self._store_for(parent)
+        return store.fetched if store is not None else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.headers)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return True
+        return self.expandable and parent.internalPointer() is None
+
+    def canFetchMore(self, parent):
+        store = self._store_for(parent)
+        return not self._fetching and store is not None and store.fetched < store.row_count()
+
+    def fetchMore(self, parent):
+        store = self._store_for(parent)
+        if store is None or self._fetching:
+            return  # views may ask for more while the previous batch is being inserted
+        self._fetch_rows(store, parent, FETCH_BATCH)
+
+    def _fetch_rows(self, store, parent, count):
+        count = min(count, store.row_count() - store.fetched)
+        if count <= 0:
+            return
+        self._fetching = True
+        try:
+            self.beginInsertRows(parent, store.fetched, store.fetched + count - 1)
+            store.fetched += count
+            self.endInsertRows()
+        finally:
+            self._fetching = False
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        store = self._store_of(index)
+        if role == Qt.DisplayRole:
+            return store.columns[index.column()][store.store_row(index.row())]
+        if role == Qt.UserRole:
+            return store.payloads[store.store_row(index.row())]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section < len(self.headers):
+            return self.headers[section]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column < 0 or column >= len(self.headers):
+            return
+        self._sort = (column, order)
+        reverse = order == Qt.DescendingOrder
+        stores = [self.store, *self.children.values()]
+        orders = {id(store): store.sort_order(column, reverse) for store in stores}
+        new_rows = {id(store): inverse_order(orders[id(store)]) for store in stores}
+        new_visible = {id(store): None if store.visible is None else sorted(new_rows[id(store)][row] for row in store.visible)
+                       for store in stores}
+
+        def new_view_row(index):
+            store = self._store_of(index)
+            row = new_rows[id(store)][store.store_row(index.row())]
+            visible = new_visible[id(store)]
+            return row if visible is None else bisect_left(visible, row)
+
+        # rows selected, expanded or hidden in a view stay fetched when they move further down
+        for index in self.persistentIndexList():
+            store = self._store_of(index)
+            row = new_view_row(index)
+            if row >= store.fetched:
+                self._fetch_rows(store, self.parent(index), row + 1 - store.fetched)
+
+        self.layoutAboutToBeChanged.emit()
+        moved = [(index, new_view_row(index)) for index in self.persistentIndexList()]
+        for store in stores:
+            store.reorder(orders[id(store)], new_rows[id(store)])
+        self._index_keys()
+        for index, row in moved:
+            self.changePersistentIndex(index, self._create_index(row, index.column(), index.internalPointer()))
+        self.layoutChanged.emit()
+
+    def _apply_sort(self, store):
+        if self._sort is not None:
+            order = store.sort_order(self._sort[0], self._sort[1] == Qt.DescendingOrder)
+            store.reorder(order, inverse_order(order))
+
+    # Filtering
+    def _filter_children(self, key, store):
+        # items of a matching playlist all stay visible, otherwise only the matching ones
+        if self._tokens and self.store.matches(self._row_of[key], self._tokens):
+            store.filter([])
+        else:
+            store.filter(self._tokens)
+
+    def set_filter(self, text):
+        """
+        Shows only rows containing every word of text, ignoring case and accents. Rows with matching
+        children stay visible, their keys are returned so views can expand them.
+        """
+        tokens = search_tokens(text)
+        self.beginResetModel()
+        self._tokens = tokens
+        expand = []
+        for key, store in self.children.items():
+            self._filter_children(key, store)
+            if tokens and store.row_count() and store.visible is not None:
+                expand.append(key)
+        self.store.filter(tokens, keep={self._row_of[key] for key in expand})
+        self.store.fetched = min(FETCH_BATCH, self.store.row_count())
+        for store in self.children.values():
+            store.fetched = store.row_count()
+        self.endResetModel()
+        return expand
+
+    def set_child_filter(self, key, text):
+        """ Filters the children of one top-level row only, keeping the row expanded """
+        store = self.children.get(key)
+        parent = self.index_of(key)
+        if store is None or not parent.isValid():
+            return
+        if store.fetched:
+            self.beginRemoveRows(parent, 0, store.fetched - 1)
+            store.fetched = 0
+            self.endRemoveRows()
+        store.filter(search_tokens(text))
+        self._fetch_rows(store, parent, store.row_count())
+
+    # Store updates
+    def set_store(self, store):
+        """ Replaces all rows, the first batch is exposed right away and the rest on demand """
+        self.beginResetModel()
+        self.store = store
+        self.children = {}
+        self._apply_sort(store)
+        self._index_keys()
+        store.filter(self._tokens)
+        store.fetched = min(FETCH_BATCH, store.row_count())
+        self.endResetModel()
+
+    def clear(self):
+        self.set_store(RowStore(len(self.headers)))
+
+    def keys(self):
+        return self._row_of.keys()
+
+    def index_of(self, key):
+        row = self._row_of.get(key)
+        row = self.store.view_row(row) if row is not None else None
+        if row is None or row >= self.store.fetched:
+            return QModelIndex()
+        return self.createIndex(row, 0)
+
+    def has_children(self, key):
+        return key in self.children
+
+    def set_children(self, key, store):
+        if key not in self._row_of:
+            return
+        self._apply_sort(store)
+        store.key = key
+        store.fetched = 0
+        self.children[key] = store
+        self._filter_children(key, store)
+        parent = self.index_of(key)
+        if parent.isValid():
+            # views only fetch top-level rows on scroll, so expanded rows show all their children at once
+            self._fetch_rows(store, parent, store.row_count())
+
+    def upsert_rows(self, rows):
+        """ Updates rows whose key is known and inserts the others, at their sorted position if sorted """
+        store = self.store
+        for texts, payload in rows:
+            key = payload[self.key_field]
+            row = self._row_of.get(key)
+            if row is not None:
+                moves = self._sort is not None and store.columns[self._sort[0]][row] != texts[self._sort[0]]
+                refilters = store.visible is not None and \
+                            store.matches(row, store.tokens) != all(token in search_text(texts) for token in store.tokens)
+                if not moves and not refilters:
+                    store.set_row(row, texts, payload)
+                    view_row = store.view_row(row)
+                    if view_row is not None and view_row < store.fetched:
+                        self.dataChanged.emit(self.index(view_row, 0), self.index(view_row, len(self.headers) - 1))
+                    continue
+                # a row changing place or visibility is removed and inserted again
+                self.remove_keys([key])
+
+            row = len(store)
+            if self._sort is not None:
+                row = store.insert_position(self._sort[0], texts[self._sort[0]], self._sort[1] == Qt.DescendingOrder)
+            view_row = row
+            if store.visible is not None:
+                view_row = bisect_left(store.visible, row) if all(token in search_text(texts) for token in store.tokens) else None
+            shown = view_row is not None and (view_row < store.fetched or store.fetched == store.row_count())
+            if shown:
+                self.beginInsertRows(QModelIndex(), view_row, view_row)
+            store.insert(row, texts, payload)
+            if shown:
+                store.fetched += 1
+                self.endInsertRows()
+            if row == len(store) - 1:
+                self._row_of[key] = row
+            else:
+                self._index_keys()
+
+    def remove_keys(self, keys):
+        store = self.store
+        rows = sorted((self._row_of[key] for key in keys if key in self._row_of), reverse=True)
+        for row in rows:
+            view_row = store.view_row(row)
+            shown = view_row is not None and view_row < store.fetched
+            if shown:
+                self.beginRemoveRows(QModelIndex(), view_row, view_row)
+            store.remove(row)
+            if shown:
+                store.fetched -= 1
+                self.endRemoveRows()
+        if rows:
+            self._index_keys()
@@ -1,6 +1,9 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtGui import QImage, QPixmap
 import requests
+from zotify.cache import CoverArtCache
+
+COVER_ART_TIMEOUT = 5  # seconds, interactive loads should fail fast
 
 def set_button_icon(btn, icon_path):
     icon = QtGui.QIcon()
@@ -11,12 +14,10 @@ def set_button_icon(btn, icon_path):
 def set_label_image(label, path_or_url, from_url=False):
     if from_url:
         try:
-            response = requests.get(path_or_url, timeout=5)
-            response.raise_for_status()
             image = QImage()
-            image.loadFromData(response.content)
+            image.loadFromData(CoverArtCache.get(path_or_url, timeout=COVER_ART_TIMEOUT))
             pixmap = QPixmap.fromImage(image)
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, OSError) as e:
             print(f"Error fetching image: {e}")
             pixmap = QPixmap("Resources/cover_default.jpg") # fallback
     else:
@@ -14,6 +14,9 @@ class WorkerSignals(QObject):
 class MusicSignals(WorkerSignals):
     update = pyqtSignal(int, int, int)
 
+class LibrarySignals(QObject):
+    changed = pyqtSignal(object)
+
 class Worker(QRunnable):
     """
     First parameter is the function run by the worker thread. *args and *kwargs are passed to the that worker function.
@@ -1,13 +1,18 @@
+import glob
+import json
 from pathlib import PurePath, Path
 from typing import Optional
 from datetime import datetime
 
+from zotify.archive import LibraryIndex
 from zotify.config import Zotify
-from zotify.const import USER_PLAYLISTS_URL, PLAYLIST_URL, ITEMS, ID, TRACK, NAME, TYPE, TRACKS
+from zotify.const import USER_PLAYLISTS_URL, PLAYLIST_URL, ITEMS, ID, TRACK, NAME, TYPE, TRACKS, SNAPSHOT_ID, \
+    OUTPUT_PLAYLIST_EXT, SHOW
 from zotify.podcast import download_episode
+from zotify.postprocess import PostProcessor
 from zotify.termoutput import Printer, PrintChannel
-from zotify.track import parse_track_metadata, download_track
-from zotify.utils import split_sanitize_intrange, strptime_utc, fill_output_template
+from zotify.track import parse_track_metadata, download_track, prefetch_track_resps
+from zotify.utils import split_sanitize_intrange, strptime_utc, predict_output_directory, fix_filename
 
 
 def get_playlist_songs(playlist_id: str) -> tuple[list[str], list[dict]]:
@@ -38,9 +43,71 @@ def get_playlist_info(playlist_id) -> tuple[str, str]:
     return resp['name'].strip(), resp['owner']['display_name'].strip()
 
 
+def get_playlist_snapshot_id(playlist_id: str) -> Optional[str]:
+    """ Returns the current snapshot_id of a playlist, which changes whenever its items do """
+    (raw, resp) = Zotify.invoke_url(f'{PLAYLIST_URL}/{playlist_id}?fields=snapshot_id')
+    return resp.get(SNAPSHOT_ID)
+
+
+def playlist_state_settings() -> str:
+    """ Returns the settings a recorded playlist state is only valid under """
+    return json.dumps([Zotify.CONFIG.get(OUTPUT_PLAYLIST_EXT), Zotify.CONFIG.get_download_format(),
+                       Zotify.CONFIG.get_download_quality(), Zotify.CONFIG.get_transcode_bitrate(),
+                       Zotify.CONFIG.get_export_m3u8()])
+
+
+def resolved_path(mode: str, extra_keys: dict, num: str, song: dict) -> Optional[PurePath]:
+    """ Returns the file a playlist item exists as where this playlist writes it, or None """
+    if song[TYPE] == "episode":
+        if not song.get(SHOW):
+            return None
+        podcast_name, episode_name = fix_filename(song[SHOW][NAME]), fix_filename(song[NAME])
+        episode_dir = Path(Zotify.CONFIG.get_root_podcast_path()) / podcast_name
+        return next((path for path in episode_dir.glob(glob.escape(f'{podcast_name} - {episode_name}') + '.*')
+                     if path.suffix != '.tmp'), None)
+    
+    track_keys = {'playlist_num': num, 'playlist_track': song[NAME], 'playlist_track_id': song[ID]}
+    try:
+        # the metadata is only parsed if the directory depends on it
+        directory = Zotify.CONFIG.get_root_path() / predict_output_directory(mode, {**extra_keys, **track_keys},
+                                                                              ((parse_track_metadata(s), {}) for s in (song,)))
+    except Exception:
+        return None # items that cannot be placed (e.g. local files) stay unresolved
+    return next((entry['path'] for entry in LibraryIndex.find(song[ID])
+                 if entry['path'].parent == directory and Path(entry['path']).exists()), None)
+
+
 def download_playlist(progress_emitter, playlist: dict, pbar_stack: Optional[list] = None):
     """Downloads all the songs from a playlist"""
+    
+    # the snapshot_id of a playlist only changes with its items, so an unchanged playlist costs one request,
+    # it is always fetched as the playlist passed in may come from a cached listing
+    snapshot_id = settings = state = None
+    if Zotify.CONFIG.get_skip_unchanged_playlists() and Zotify.CONFIG.get_skip_existing():
+        snapshot_id = get_playlist_snapshot_id(playlist[ID])
+        settings = playlist_state_settings()
+        state = LibraryIndex.playlist_state(playlist[ID]) if snapshot_id else None
+        if state is not None and state['settings'] != settings:
+            state = None
+        if state is not None and state['complete'] and state['snapshot_id'] == snapshot_id and \
+           all(Path(path).exists() for path in state['items'].values()):
+            Printer.hashtaged(PrintChannel.SKIPPING, f'PLAYLIST "{playlist[NAME]}" (UNCHANGED SINCE LAST DOWNLOAD)')
+            if progress_emitter:
+                progress_emitter(0, 0, 100)
+            return
+    
     playlist_num, playlist_tracks = get_playlist_songs(playlist[ID])
+    item_ids = [song[ID] for song in playlist_tracks if song is not None]
+    resolved = {}
+    if state is not None and not Zotify.CONFIG.get_export_m3u8():
+        # only items added, left unresolved or whose file is gone since the last download, the .m3u8 needs every item
+        current_ids = set(item_ids)
+        resolved = {item_id: path for item_id, path in state['items'].items() if item_id in current_ids and Path(path).exists()}
+        pending = [(num, song) for num, song in zip(playlist_num, playlist_tracks) if song is not None and song[ID] not in resolved]
+        playlist_num = [num for num, song in pending]
+        playlist_tracks = [song for num, song in pending]
+        Printer.hashtaged(PrintChannel.PROGRESS_INFO, f'PLAYLIST "{playlist[NAME]}" WAS DOWNLOADED BEFORE\n' +\
+                                                      f'{len(playlist_tracks)} new or unresolved item(s) to process')
     
     pos, pbar_stack = Printer.pbar_position_handler(3, pbar_stack)
     pbar = Printer.pbar(playlist_tracks, unit='song', pos=pos,
@@ -62,16 +129,10 @@ def download_playlist(progress_emitter, playlist: dict, pbar_stack: Optional[lis
         if m3u_dir is None:
             m3u_dir = Zotify.CONFIG.get_root_path()
             try:
-                if len(playlist_tracks) > 0:
-                    output_template = Zotify.CONFIG.get_output(mode)
-                    extra_keys.update({'playlist_num': "00"})
-                    first_track_path, _ = fill_output_template(output_template, parse_track_metadata(playlist_tracks[0]), extra_keys)
-                    m3u_dir /= PurePath(first_track_path).parent
-                if len(playlist_tracks) > 1:
-                    extra_keys.update({'playlist_num': "01"})
-                    second_track_path, _ = fill_output_template(output_template, parse_track_metadata(playlist_tracks[1]), extra_keys)
-                    if PurePath(first_track_path).parent != PurePath(second_track_path).parent:
-                        raise ValueError(f'No shared parent directory between `{first_track_path}` and `{second_track_path}`')
+                # directories varying per song are detected by comparing the first two tracks
+                sample_tracks = ((parse_track_metadata(song), {'playlist_num': num})
+                                 for num, song in zip(("00", "01"), playlist_tracks))
+                m3u_dir /= predict_output_directory(mode, extra_keys, sample_tracks)
             except Exception as e:
                 Printer.hashtaged(PrintChannel.ERROR, f'FAILED TO PREDICT M3U8 DIRECTORY FOR "{playlist[NAME]}"\n' +\
                                                        'Ensure OUTPUT_PLAYLIST_EXT only varies per song in the final path section')
@@ -87,6 +148,8 @@ def download_playlist(progress_emitter, playlist: dict, pbar_stack: Optional[lis
             m3u8_path.rename(old_m3u8_path)
         extra_keys.update({'m3u8_path': m3u8_path})
     
+    track_resps = prefetch_track_resps([song[ID] for song in playlist_tracks if song is not None and song[TYPE] != "episode"])
+    
     for i, song in enumerate(pbar):
         if song is None:
             continue
@@ -98,15 +161,24 @@ def download_playlist(progress_emitter, playlist: dict, pbar_stack: Optional[lis
             extra_keys.update({'playlist_num': playlist_num[i],
                                'playlist_track': song[NAME],
                                'playlist_track_id': song[ID]})
-            download_track(progress_emitter, mode, song[ID], extra_keys, pbar_stack)
+            download_track(progress_emitter, mode, song[ID], extra_keys, pbar_stack, track_resps.get(song[ID]))
         pbar.set_description(song[NAME])
         Printer.refresh_all_pbars(pbar_stack)
         if progress_emitter:
-            progress_emitter.emit(i + 1, len(playlist_tracks), int((i + 1) / len(playlist_tracks) * 100))
+            progress_emitter(i + 1, len(playlist_tracks), int((i + 1) / len(playlist_tracks) * 100))
     
     if Zotify.CONFIG.get_export_m3u8() and old_m3u8_path.exists():
         old_m3u8_path.unlink()
 
+    if snapshot_id:
+        PostProcessor.drain()
+        for num, song in zip(playlist_num, playlist_tracks):
+            path = resolved_path(mode, extra_keys, num, song) if song is not None else None
+            if path is not None:
+                resolved[song[ID]] = path
+        LibraryIndex.set_playlist_state(playlist[ID], snapshot_id, settings, all(item_id in resolved for item_id in item_ids),
+                                        resolved)
+
 
 def download_from_user_playlist(progress_emitter):
     """ Select which playlist(s) to download """
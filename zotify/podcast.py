@@ -5,7 +5,7 @@ from pathlib import PurePath, Path
 from typing import Optional, Union
 from librespot.metadata import EpisodeId
 
-from zotify.config import Zotify
+from zotify.config import Zotify, PagedItems
 from zotify.const import EPISODE_URL, SHOW_URL, PARTNER_URL, PERSISTED_QUERY, ERROR, ID, ITEMS, NAME, SHOW, DURATION_MS, EXT_MAP
 from zotify.termoutput import PrintChannel, Printer, Loader
 from zotify.utils import create_download_directory, fix_filename, fmt_duration, wait_between_downloads
@@ -22,19 +22,18 @@ def get_episode_info(episode_id: str) -> tuple[Optional[str], Optional[str], Opt
     return fix_filename(resp[SHOW][NAME]), duration_ms, fix_filename(resp[NAME])
 
 
-def get_show_episode_ids(show_id: str) -> list:
+def get_show_episode_ids(show_id: str) -> PagedItems:
+    """ Returns the episode IDs of a show, fetched page by page as they are iterated """
     with Loader(PrintChannel.PROGRESS_INFO, "Fetching episodes..."):
-        episodes = Zotify.invoke_url_nextable(f'{SHOW_URL}/{show_id}/episodes', ITEMS)
-    return [episode[ID] for episode in episodes]
+        return Zotify.invoke_url_paged(f'{SHOW_URL}/{show_id}/episodes', ITEMS, transform=lambda episode: episode[ID])
 
 
 def download_podcast_directly(url, filename):
     import functools
     import shutil
-    import requests
     from tqdm.auto import tqdm
     
-    r = requests.get(url, stream=True, allow_redirects=True)
+    r = Zotify.http_get(url, stream=True, allow_redirects=True)
     if r.status_code != 200:
         r.raise_for_status()  # Will only raise for 4xx codes, so...
         raise RuntimeError(
@@ -0,0 +1,109 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from zotify.config import Zotify
+from zotify.termoutput import Printer
+
+
+class PostProcessor:
+    """
+    Bounded worker pool for the CPU-heavy tail of a track download (conversion, tagging).
+    
+    Each job returns an optional finalize callable (archive/index updates, final print). Jobs may
+    finish in any order, but finalizers always run one at a time in submission order. At most
+    twice as many jobs as workers can be unfinalized at once; submit() blocks beyond that.
+    """
+    
+    _executor: Optional[ThreadPoolExecutor] = None
+    _workers = 0
+    _slots: Optional[threading.Semaphore] = None
+    _cond = threading.Condition()
+    _next_seq = 0
+    _finalized_seq = 0
+    _ready: dict[int, Optional[Callable[[], None]]] = {}
+    _pending: dict[int, tuple[str, str]] = {}
+    
+    @classmethod
+    def _ensure_pool(cls, workers: int) -> None:
+        if cls._executor is not None and cls._workers == workers:
+            return
+        cls.drain()
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=True)
+        else:
+            atexit.register(cls.shutdown)
+        cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zotify-postprocess')
+        cls._workers = workers
+        cls._slots = threading.Semaphore(workers * 2)
+    
+    @classmethod
+    def submit(cls, process: Callable[[], Optional[Callable[[], None]]], track_id: str = '', directory: str = '') -> None:
+        """ Runs process() in the pool (or inline if POSTPROCESS_WORKERS is 0) and its finalizer in order """
+        workers = Zotify.CONFIG.get_postprocess_workers()
+        if workers == 0:
+            finalize = cls._run_process(process)
+            if finalize is not None:
+                cls._run_finalize(finalize)
+            return
+        
+        cls._ensure_pool(workers)
+        cls._slots.acquire()
+        with cls._cond:
+            seq = cls._next_seq
+            cls._next_seq += 1
+            cls._pending[seq] = (track_id, str(directory))
+        cls._executor.submit(cls._run, seq, process)
+    
+    @staticmethod
+    def _run_process(process: Callable) -> Optional[Callable[[], None]]:
+        try:
+            return process()
+        except Exception as e:
+            Printer.traceback(e)
+            return None
+    
+    @staticmethod
+    def _run_finalize(finalize: Callable[[], None]) -> None:
+        try:
+            finalize()
+        except Exception as e:
+            Printer.traceback(e)
+    
+    @classmethod
+    def _run(cls, seq: int, process: Callable) -> None:
+        finalize = cls._run_process(process)
+        with cls._cond:
+            cls._ready[seq] = finalize
+            # whichever worker closes the gap runs every finalizer that is now due
+            while cls._finalized_seq in cls._ready:
+                due = cls._ready.pop(cls._finalized_seq)
+                if due is not None:
+                    cls._run_finalize(due)
+                cls._pending.pop(cls._finalized_seq, None)
+                cls._finalized_seq += 1
+                cls._slots.release()
+            cls._cond.notify_all()
+    
+    @classmethod
+    def is_pending(cls, track_id: str, directory: Optional[str] = None) -> bool:
+        """ Returns True if the track (optionally into the given directory) is still being processed """
+        with cls._cond:
+            return any(pending_id == track_id and (directory is None or pending_dir == str(directory))
+                       for pending_id, pending_dir in cls._pending.values())
+    
+    @classmethod
+    def drain(cls) -> None:
+        """ Blocks until every submitted track has been finalized """
+        with cls._cond:
+            cls._cond.wait_for(lambda: cls._finalized_seq == cls._next_seq)
+    
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._executor is None:
+            return
+        cls.drain()
+        cls._executor.shutdown(wait=True)
+        cls._executor = None
+        cls._workers = 0
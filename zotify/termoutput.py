@@ -1,12 +1,16 @@
 from __future__ import annotations
+import atexit
 import platform
+import sys
 from os import get_terminal_size, system
 from itertools import cycle
 from time import sleep
 from typing import Union, Optional
 from pprint import pformat
 from tabulate import tabulate
-from threading import Thread
+from queue import Empty, Queue
+from threading import Event, Lock, RLock, Thread, current_thread
+from time import monotonic
 from traceback import TracebackException
 from enum import Enum
 from tqdm import tqdm
@@ -51,9 +55,17 @@ class PrintCategory(Enum):
 LAST_PRINT: PrintCategory = PrintCategory.NONE
 ACTIVE_LOADER: Optional[Loader] = None
 ACTIVE_PBARS: list[tqdm] = []
+FRAME_INTERVAL = 0.1 # seconds between coalesced progress bar redraws
+ZOTIFY = None
 
 
 class Printer:
+    _queue: Queue = Queue()
+    _renderer: Optional[Thread] = None
+    _renderer_lock = RLock()
+    _dirty_pbars: dict[int, tqdm] = {}
+    _dirty_lock = Lock()
+    
     @staticmethod
     def _term_cols() -> int:
         try:
@@ -108,6 +120,9 @@ class Printer:
             msg = "#" * (Printer._term_cols()-1) + "\n" + msg + "\n" + "#" * Printer._term_cols()
         
         global LAST_PRINT
+        if category is PrintCategory.LOADER_CYCLE and LAST_PRINT not in {PrintCategory.LOADER, PrintCategory.LOADER_CYCLE}:
+            # something else was printed since the last frame, start a new line instead of overwriting it
+            category = PrintCategory.LOADER
         if LAST_PRINT is PrintCategory.DEBUG and category is PrintCategory.DEBUG:
             pass
         elif LAST_PRINT in {PrintCategory.LOADER, PrintCategory.LOADER_CYCLE} and category is PrintCategory.LOADER:
@@ -128,23 +143,101 @@ class Printer:
             else:
                 ACTIVE_LOADER.pause()
     
+    @staticmethod
+    def _config():
+        """ Resolves Zotify.CONFIG once (deferred, zotify.config imports this module) """
+        global ZOTIFY
+        if ZOTIFY is None:
+            from zotify.config import Zotify
+            ZOTIFY = Zotify
+        return ZOTIFY.CONFIG
+    
     @staticmethod
     def new_print(channel: PrintChannel, msg: str, category: PrintCategory = PrintCategory.NONE, skip_toggle: bool = False, end: str = "\n") -> None:
+        """ Queues a message for the renderer thread, never blocks on terminal I/O """
+        if channel == PrintChannel.MANDATORY or Printer._config().get(channel.value):
+            Printer._ensure_renderer()
+            Printer._queue.put((channel, str(msg), category, end))
+    
+    @staticmethod
+    def _render_message(channel: PrintChannel, msg: str, category: PrintCategory, end: str) -> str:
         global LAST_PRINT
-        if channel != PrintChannel.MANDATORY:
-            from zotify.config import Zotify
-        if channel == PrintChannel.MANDATORY or Zotify.CONFIG.get(channel.value):
-            msg, category = Printer._print_prefixes(msg, category, channel)
-            if channel == PrintChannel.DEBUG and Zotify.CONFIG.logger:
-                Zotify.CONFIG.logger.debug(msg.strip().replace("DEBUG", "\n") + "\n")
-            Printer._toggle_active_loader(skip_toggle)
-            for line in str(msg).splitlines():   
-                if end == "\n": 
-                    tqdm.write(line.ljust(Printer._term_cols()))
-                else:
-                    tqdm.write(line, end=end)
-                LAST_PRINT = category
-            Printer._toggle_active_loader(skip_toggle)
+        msg, category = Printer._print_prefixes(msg, category, channel)
+        if channel == PrintChannel.DEBUG and Printer._config().logger:
+            Printer._config().logger.debug(msg.strip().replace("DEBUG", "\n") + "\n")
+        lines = msg.splitlines()
+        if lines:
+            LAST_PRINT = category
+        if end == "\n":
+            cols = Printer._term_cols()
+            return "".join(line.ljust(cols) + "\n" for line in lines)
+        return "".join(line + end for line in lines)
+    
+    @staticmethod
+    def _ensure_renderer() -> None:
+        if Printer._renderer is None or not Printer._renderer.is_alive():
+            with Printer._renderer_lock:
+                if Printer._renderer is None or not Printer._renderer.is_alive():
+                    Printer._renderer = Thread(target=Printer._render, daemon=True, name='zotify-printer')
+                    Printer._renderer.start()
+    
+    @staticmethod
+    def _render() -> None:
+        """ Renderer thread: batches queued lines into one write and redraws dirty bars at most every FRAME_INTERVAL """
+        last_frame = 0.0
+        while True:
+            try:
+                batch = [Printer._queue.get(timeout=FRAME_INTERVAL)]
+            except Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(Printer._queue.get_nowait())
+                except Empty:
+                    break
+            
+            # a failing message or a broken terminal must not take down the renderer or the rest of the batch
+            try:
+                chunks = []
+                for channel, msg, category, end in batch:
+                    try:
+                        chunks.append(Printer._render_message(channel, msg, category, end))
+                    except Exception as e:
+                        Printer._render_failed(f'{channel.name} message {msg!r}', e)
+                text = "".join(chunks)
+                if text:
+                    try:
+                        tqdm.write(text, end="")
+                    except Exception as e:
+                        Printer._render_failed(f'output {text!r}', e)
+                if Printer._dirty_pbars and monotonic() - last_frame >= FRAME_INTERVAL:
+                    last_frame = monotonic()
+                    with Printer._dirty_lock:
+                        dirty, Printer._dirty_pbars = Printer._dirty_pbars, {}
+                    for pbar in dirty.values():
+                        if not pbar.disable:
+                            try:
+                                pbar.refresh()
+                            except Exception as e:
+                                Printer._render_failed('progress bar', e)
+            finally:
+                for _ in batch:
+                    Printer._queue.task_done()
+    
+    @staticmethod
+    def _render_failed(what: str, e: Exception) -> None:
+        """ Reports a render failure straight to stderr, bypassing the queue """
+        try:
+            sys.stderr.write(f'Failed to render {what}: {e!r}\n')
+            sys.stderr.flush()
+        except Exception:
+            pass
+    
+    @staticmethod
+    def flush() -> None:
+        """ Blocks until every queued message has been written """
+        if Printer._renderer is not None and current_thread() is not Printer._renderer:
+            Printer._queue.join()
     
     @staticmethod
     def get_input(prompt: str) -> str:
@@ -152,6 +245,7 @@ class Printer:
         Printer._toggle_active_loader()
         while len(user_input) == 0:
             Printer.new_print(PrintChannel.MANDATORY, prompt, PrintCategory.GENERAL, end="", skip_toggle=True)
+            Printer.flush()
             user_input = str(input())
         Printer._toggle_active_loader()
         return user_input
@@ -228,7 +322,8 @@ class Printer:
     @staticmethod
     def pbar(iterable=None, desc=None, total=None, unit='it', 
             disable=False, unit_scale=False, unit_divisor=1000, pos=1) -> tqdm:
-        if iterable and len(iterable) == 1 and len(ACTIVE_PBARS) > 0:
+        count = total if total is not None or iterable is None else len(iterable)
+        if count == 1 and len(ACTIVE_PBARS) > 0:
             disable = True # minimize clutter
         new_pbar = tqdm(iterable=iterable, desc=desc, total=total, disable=disable, position=pos, 
                         unit=unit, unit_scale=unit_scale, unit_divisor=unit_divisor, leave=False)
@@ -238,8 +333,12 @@ class Printer:
     
     @staticmethod
     def refresh_all_pbars(pbar_stack: Optional[list[tqdm]], skip_pop: bool = False) -> None:
-        for pbar in pbar_stack:
-            pbar.refresh()
+        """ Marks the bars for redraw on the renderer's next frame """
+        with Printer._dirty_lock:
+            for pbar in pbar_stack:
+                Printer._dirty_pbars[id(pbar)] = pbar
+        if pbar_stack:
+            Printer._ensure_renderer()
         
         if not skip_pop and pbar_stack:
             if pbar_stack[-1].n == pbar_stack[-1].total: 
@@ -266,11 +365,19 @@ class Loader:
     with Loader("This may take some Time..."):
         # do something
         pass
+    
+    All loaders share one long-lived render thread which animates whichever loader is active,
+    so entering and leaving a loader never blocks the caller. Work that finishes before the
+    first frame is due (one `timeout`) is never drawn.
     """
     
     # load symbol from:
     # https://stackoverflow.com/questions/22029562/python-how-to-make-simple-animated-loading-while-process-is-running
     
+    _render_thread: Optional[Thread] = None
+    _render_lock = RLock() # held while a frame is drawn
+    _wake = Event()
+    
     def __init__(self, chan, desc="Loading...", end='', timeout=0.1, mode='prog'):
         """
         A loader-like context manager
@@ -286,7 +393,6 @@ class Loader:
         self.channel = chan
         self.category = PrintCategory.LOADER
         
-        self._thread = Thread(target=self._animate, daemon=True)
         if mode == 'std1':
             self.steps = ["⢿", "⣻", "⣽", "⣾", "⣷", "⣯", "⣟", "⡿"]
         elif mode == 'std2':
@@ -295,10 +401,10 @@ class Loader:
             self.steps = ["😐 ","😐 ","😮 ","😮 ","😦 ","😦 ","😧 ","😧 ","🤯 ","💥 ","✨ ","\u3000 ","\u3000 ","\u3000 "]
         elif mode == 'prog':
             self.steps = ["[∙∙∙]","[●∙∙]","[∙●∙]","[∙∙●]","[∙∙∙]"]
+        self._steps = cycle(self.steps)
         
         self.done = False
         self.paused = False
-        self.dead = False
     
     def _loader_print(self, msg: str):
         Printer.new_print(self.channel, msg, self.category, skip_toggle=True)
@@ -315,41 +421,54 @@ class Loader:
         global ACTIVE_LOADER
         ACTIVE_LOADER = self._inherited_active_loader
     
+    @classmethod
+    def _ensure_render_thread(cls):
+        if cls._render_thread is None or not cls._render_thread.is_alive():
+            cls._render_thread = Thread(target=cls._render, daemon=True, name='zotify-loader')
+            cls._render_thread.start()
+    
+    @classmethod
+    def _render(cls):
+        while True:
+            loader = ACTIVE_LOADER
+            if loader is None:
+                cls._wake.wait()
+                cls._wake.clear()
+                continue
+            sleep(loader.timeout)
+            with cls._render_lock:
+                # the loader may have been stopped or replaced while sleeping
+                if loader is ACTIVE_LOADER and not loader.done and not loader.paused:
+                    loader._loader_print(f"{next(loader._steps)} {loader.desc}")
+    
     def start(self):
         self.store_active_loader()
-        self._thread.start()
-        sleep(self.timeout*2) #guarantee _animate can print at least once
+        Loader._ensure_render_thread()
+        Loader._wake.set()
         return self
     
-    def _animate(self):
-        for c in cycle(self.steps):
-            if self.done:
-                break
-            elif not self.paused:
-                self._loader_print(f"{c} {self.desc}")
-            sleep(self.timeout)
-        self.dead = True
-    
     def __enter__(self):
         self.start()
     
     def stop(self):
-        self.done = True
-        while not self.dead: #guarantee _animate has finished
-            sleep(self.timeout) 
+        with Loader._render_lock: # guarantee no frame is drawn after this
+            self.done = True
         self.category = PrintCategory.LOADER
         if self.end != "":
             self._loader_print(self.end)
         self.release_active_loader()
     
     def pause(self):
-        self.paused = True
+        with Loader._render_lock:
+            self.paused = True
     
     def resume(self):
         self.category = PrintCategory.LOADER
         self.paused = False
-        sleep(self.timeout*2) #guarantee _animate can print at least once
     
     def __exit__(self, exc_type, exc_value, tb):
         # handle exceptions with those variables ^
         self.stop()
+
+
+atexit.register(Printer.flush)
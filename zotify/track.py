@@ -1,24 +1,32 @@
+import hashlib
+import json
 import time
 import uuid
 import ffmpy
 from queue import Empty
-from typing import Union, Optional
+from contextlib import nullcontext
+from functools import partial
+from typing import Callable, Union, Optional
 from pathlib import Path, PurePath
 from librespot.metadata import TrackId
 
 from zotify import __version__
+from zotify.archive import SongArchive, LibraryIndex
+from zotify.cache import ArtistCache, DirectoryCache
 from zotify.config import Zotify
+from zotify.postprocess import PostProcessor
 from zotify.const import TRACKS, ALBUM, GENRES, NAME, DISC_NUMBER, TRACK_NUMBER, TOTAL_TRACKS, \
     IS_PLAYABLE, ARTISTS, ARTIST_IDS, IMAGES, URL, RELEASE_DATE, ID, TRACK_URL, \
-    CODEC_MAP, DURATION_MS, WIDTH, COMPILATION, ALBUM_TYPE, ARTIST_BULK_URL, YEAR, \
-    ALBUM_ARTISTS, IMAGE_URL, EXPORT_M3U8, AudioKeyError, BULK_WAIT_TIME
+    CODEC_MAP, DURATION_MS, WIDTH, COMPILATION, ALBUM_TYPE, YEAR, \
+    ALBUM_ARTISTS, IMAGE_URL, EXPORT_M3U8, AudioKeyError, BULK_WAIT_TIME, BULK_APPEND, MARKET_APPEND
 
 MAX_WAIT_TIME = 60
 from zotify.termoutput import Printer, PrintChannel, Loader
-from zotify.utils import fill_output_template, set_audio_tags, set_music_thumbnail, create_download_directory, \
-    add_to_m3u8, fetch_m3u8_songs, get_directory_song_ids, add_to_directory_song_archive, \
-    get_archived_tracks_info, add_to_song_archive, fmt_duration, wait_between_downloads, conv_artist_format, \
-    conv_genre_format, compare_audio_tags, fix_filename
+from zotify.utils import fill_output_template, set_audio_tags, get_album_art, save_album_art_jpg, create_download_directory, \
+    add_to_m3u8, fetch_m3u8_songs, in_directory_song_archive, add_to_directory_song_archive, \
+    get_archived_track_info, add_to_song_archive, fmt_duration, wait_between_downloads, conv_artist_format, \
+    conv_genre_format, compare_audio_tags, fix_filename, get_audio_tags, walk_directory_for_tracks, \
+    read_files_bulk
 
 
 def parse_track_metadata(track_resp: dict) -> dict[str, Union[list[str], str, int, bool]]:
@@ -66,11 +74,31 @@ def get_track_metadata(track_id) -> dict[str, Union[list[str], str, int, bool]]:
             raise ValueError(f'Failed to parse TRACK_URL response: {str(e)}\n{raw}')
 
 
+def prefetch_track_resps(track_ids: list[str]) -> dict[str, dict]:
+    """ Retrieves full track API objects for a whole collection, 50 IDs per request """
+    unique_ids = list(dict.fromkeys(track_id for track_id in track_ids if track_id))
+    if not unique_ids:
+        return {}
+    
+    try:
+        with Loader(PrintChannel.PROGRESS_INFO, f"Fetching track information for {len(unique_ids)} tracks..."):
+            track_resps = Zotify.invoke_url_bulk(f'{TRACK_URL}?{MARKET_APPEND}&{BULK_APPEND}', unique_ids, TRACKS)
+    except Exception as e:
+        # download_track falls back to fetching each track individually
+        Printer.hashtaged(PrintChannel.WARNING, 'FAILED TO PREFETCH TRACK METADATA\n' +\
+                                                'FETCHING PER TRACK INSTEAD')
+        Printer.traceback(e)
+        return {}
+    
+    # bulk responses preserve request order, with None for unknown IDs
+    return {track_id: track_resp for track_id, track_resp in zip(unique_ids, track_resps) if track_resp}
+
+
 def get_track_genres(artist_ids: list[str], track_name: str) -> list[str]:
     if Zotify.CONFIG.get_save_genres():
         with Loader(PrintChannel.PROGRESS_INFO, "Fetching genre information..."):
             
-            artists = Zotify.invoke_url_bulk(ARTIST_BULK_URL, artist_ids, ARTISTS)
+            artists = ArtistCache.get_artists(artist_ids)
             
             genres = set()
             for artist in artists:
@@ -148,7 +176,20 @@ def handle_lyrics(track_id: str, filedir: PurePath, track_metadata: dict) -> Opt
     return lyrics
 
 
-def update_track_metadata(track_id: str, track_path: Path, track_resp: dict) -> None:
+def fetch_album_art(track_metadata: dict) -> Optional[bytes]:
+    """ Returns the album cover of a track, or None if it cannot be fetched so the text tags are still written """
+    try:
+        return get_album_art(track_metadata[IMAGE_URL])
+    except Exception as e:
+        Printer.hashtaged(PrintChannel.WARNING, 'FAILED TO FETCH ALBUM ART\n' +\
+                                               f'Track_Name: {track_metadata[NAME]} - Track_ID: {track_metadata[ID]}')
+        Printer.traceback(e)
+        return None
+
+
+def update_track_metadata(track_id: str, track_path: Path, track_resp: dict,
+                          tags_onfile: Optional[tuple[tuple, tuple]] = None) -> Optional[Union[list, bool]]:
+    """ Rewrites outdated tags, returns the mismatches found (falsy if none) or None if the update failed """
     track_metadata = parse_track_metadata(track_resp)
     (scraped_track_id, track_name, artists, artist_ids, release_date, release_year, track_number, total_tracks,
      album, album_artists, disc_number, compilation, duration_ms, image_url, is_playable) = track_metadata.values()
@@ -159,34 +200,184 @@ def update_track_metadata(track_id: str, track_path: Path, track_resp: dict) ->
     
     reliable_tags = (conv_artist_format(artists), conv_genre_format(genres), track_name, album, 
                      conv_artist_format(album_artists), release_year, disc_number, track_number)
-    unreliable_tags = (track_id, total_tracks if Zotify.CONFIG.get_disc_track_totals() else None,
-                       total_discs if Zotify.CONFIG.get_disc_track_totals() else None, compilation, lyrics)
+    # same order as read back by get_audio_tags
+    unreliable_tags = (str(int(total_tracks)) if Zotify.CONFIG.get_disc_track_totals() else None,
+                       total_discs if Zotify.CONFIG.get_disc_track_totals() else None, compilation, lyrics, track_id)
     
-    mismatches = compare_audio_tags(track_path, reliable_tags, unreliable_tags)
+    mismatches = compare_audio_tags(track_path, reliable_tags, unreliable_tags, tags_onfile)
     if not mismatches:
         Printer.hashtaged(PrintChannel.DOWNLOADS, f'VERIFIED:  METADATA FOR "{track_path.relative_to(Zotify.CONFIG.get_root_path())}"\n' +\
                                                    '(NO UPDATES REQUIRED)')
-        return
+        return mismatches
     
     try:
         Printer.debug(f'Metadata Mismatches:', mismatches)
-        set_audio_tags(track_path, track_metadata, total_discs, genres, lyrics)
-        set_music_thumbnail(track_path, track_metadata[IMAGE_URL], mode="single")
+        img = fetch_album_art(track_metadata)
+        set_audio_tags(track_path, track_metadata, total_discs, genres, lyrics, img)
+        if img is not None:
+            save_album_art_jpg(track_path, img, mode="single")
         Printer.hashtaged(PrintChannel.DOWNLOADS, f'VERIFIED:  METADATA FOR "{track_path.relative_to(Zotify.CONFIG.get_root_path())}"\n' +\
                                                   f'(UPDATED TAGS TO MATCH CURRENT API METADATA)')
+        return mismatches
     except Exception as e:
         Printer.hashtaged(PrintChannel.ERROR, "FAILED TO WRITE METADATA\n" +\
                                               "Ensure FFMPEG is installed and added to your PATH")
         Printer.traceback(e)
+        return None
+
+
+def get_audio_track_id(track_path: Path) -> Optional[str]:
+    """ Returns the track ID Zotify tagged the file with, if any """
+    try:
+        track_id = get_audio_tags(track_path)[1][-1]
+    except Exception:
+        return None
+    return track_id if isinstance(track_id, str) and track_id else None
+
+
+def map_library_track_ids(track_paths: list[Path], fingerprints: dict[PurePath, tuple]) -> tuple[dict[Path, str], dict[str, int]]:
+    """
+    Maps library files to track IDs using, in order, the library index (exact path), the song archive
+    (filename stem), the fingerprint of an unchanged file and finally the track ID tag embedded in the
+    file. Returns the mapping and how many files each source resolved.
+    """
+    indexed_ids = {Path(path): track_id for path, track_id in LibraryIndex.track_ids_by_path().items()}
+    archived_ids: dict[str, str] = {}
+    for track_id, filename in SongArchive.filenames():
+        archived_ids.setdefault(PurePath(filename).stem, track_id)
+    
+    track_ids: dict[Path, str] = {}
+    sources = {'index': 0, 'archive': 0, 'fingerprint': 0, 'tag': 0, 'unknown': 0}
+    untracked: list[Path] = []
+    for track_path in track_paths:
+        if track_path in indexed_ids:
+            track_ids[track_path] = indexed_ids[track_path]
+            sources['index'] += 1
+        elif track_path.stem in archived_ids:
+            track_ids[track_path] = archived_ids[track_path.stem]
+            sources['archive'] += 1
+        elif track_path in fingerprints and fingerprints[track_path][1:3] == file_fingerprint(track_path):
+            track_ids[track_path] = fingerprints[track_path][0]
+            sources['fingerprint'] += 1
+        else:
+            untracked.append(track_path)
+    
+    for track_path, track_id in read_files_bulk(untracked, get_audio_track_id):
+        if track_id:
+            track_ids[track_path] = track_id
+            sources['tag'] += 1
+        else:
+            sources['unknown'] += 1
+    return track_ids, sources
 
 
-def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optional[dict] = None, pbar_stack: Optional[list] = None) -> None:
-    """ Downloads raw song audio content stream"""
+def file_fingerprint(track_path: Path) -> tuple[Optional[int], Optional[int]]:
+    try:
+        st = track_path.stat()
+    except OSError:
+        return None, None
+    return st.st_size, st.st_mtime_ns
+
+
+def track_metadata_hash(track_resp: dict) -> str:
+    """ Hashes the API metadata (and tag settings) a file is verified against, lyrics are not fetched for this """
+    track_metadata = parse_track_metadata(track_resp)
+    genres = []
+    if Zotify.CONFIG.get_save_genres():
+        genres = sorted({genre for artist in ArtistCache.get_artists(track_metadata[ARTIST_IDS]) for genre in artist.get(GENRES, [])})
+    settings = (Zotify.CONFIG.get_save_genres(), Zotify.CONFIG.get_disc_track_totals(), Zotify.CONFIG.get_strict_library_verify(),
+                Zotify.CONFIG.get_download_lyrics(), Zotify.CONFIG.get_always_check_lyrics())
+    payload = json.dumps([track_metadata, genres, settings], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def verify_library() -> None:
+    """
+    Checks the tags of every identifiable track under ROOT_PATH against the API and rewrites outdated ones.
+    Files whose size, mtime and upstream metadata are unchanged since their last verification are skipped.
+    """
+    fingerprints = LibraryIndex.fingerprints()
+    with Loader(PrintChannel.PROGRESS_INFO, "Scanning library..."):
+        library = sorted(walk_directory_for_tracks(Zotify.CONFIG.get_root_path()))
+        track_ids, sources = map_library_track_ids(library, fingerprints)
+    
+    track_resps = prefetch_track_resps(list(track_ids.values()))
+    
+    # one bulk artist lookup instead of one per track, get_track_genres then hits the cache
+    if Zotify.CONFIG.get_save_genres():
+        artist_ids = [artist[ID] for track_resp in track_resps.values() for artist in track_resp[ARTISTS]]
+        with Loader(PrintChannel.PROGRESS_INFO, f"Fetching genre information for {len(set(artist_ids))} artists..."):
+            ArtistCache.get_artists(artist_ids)
+    
+    results = {'unchanged': 0, 'up to date': 0, 'updated': 0, 'failed': 0, 'unavailable': 0}
+    mismatched_tags: dict[str, int] = {}
+    verified: list[tuple[PurePath, str, str]] = []
+    metadata_hashes: dict[Path, str] = {}
+    for track_path, track_id in track_ids.items():
+        if track_id not in track_resps:
+            results['unavailable'] += 1
+            continue
+        
+        metadata_hash = track_metadata_hash(track_resps[track_id])
+        if track_path in fingerprints and fingerprints[track_path][1:] == (*file_fingerprint(track_path), metadata_hash):
+            results['unchanged'] += 1
+            continue
+        metadata_hashes[track_path] = metadata_hash
+        
+    # tags are read ahead on a thread pool, comparing and rewriting stays in library order
+    pbar = Printer.pbar(total=len(metadata_hashes), unit='tracks', pos=1,
+                        disable=not Zotify.CONFIG.get_show_url_pbar())
+    for track_path, tags_onfile in read_files_bulk(list(metadata_hashes), get_audio_tags):
+        pbar.update()
+        track_id, metadata_hash = track_ids[track_path], metadata_hashes[track_path]
+        try:
+            if isinstance(tags_onfile, Exception):
+                raise tags_onfile
+            mismatches = update_track_metadata(track_id, track_path, track_resps[track_id], tags_onfile)
+        except Exception as e:
+            Printer.hashtaged(PrintChannel.ERROR, 'FAILED TO VERIFY METADATA\n' +\
+                                                 f'Track_Path: {track_path}')
+            Printer.traceback(e)
+            mismatches = None
+        
+        if mismatches is None:
+            results['failed'] += 1
+            continue
+        elif not mismatches:
+            results['up to date'] += 1
+        else:
+            results['updated'] += 1
+            for tag_name in ([m[0] for m in mismatches] if isinstance(mismatches, list) else ['missing optional tags']):
+                mismatched_tags[tag_name] = mismatched_tags.get(tag_name, 0) + 1
+    
+        verified.append((track_path, track_id, metadata_hash))
+        if len(verified) >= 500:
+            LibraryIndex.set_fingerprints(verified)
+            verified = []
+    LibraryIndex.set_fingerprints(verified)
+    pbar.close()
+    
+    Printer.hashtaged(PrintChannel.MANDATORY, 'LIBRARY VERIFICATION SUMMARY\n' +\
+                                              f'Files Scanned: {len(library)} - Identified By: ' +\
+                                              ', '.join(f'{k} {v}' for k, v in sources.items() if k != 'unknown') + '\n' +\
+                                              f'Unidentified Files: {sources["unknown"]} - Unavailable Tracks: {results["unavailable"]}\n' +\
+                                              f'Unchanged Since Last Verify: {results["unchanged"]} - Up To Date: {results["up to date"]} - ' +\
+                                              f'Updated: {results["updated"]} - Failed: {results["failed"]}' +\
+                                              (('\nMismatched Tags: ' + ', '.join(f'{k} {v}' for k, v in
+                                                sorted(mismatched_tags.items(), key=lambda kv: -kv[1]))) if mismatched_tags else ''))
+
+
+def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optional[dict] = None, pbar_stack: Optional[list] = None,
+                   track_resp: Optional[dict] = None) -> None:
+    """ Downloads raw song audio content stream, optionally from an already fetched (see prefetch_track_resps) track API object """
+
+    if PostProcessor.is_pending(track_id):
+        # same track queued twice in a row, let the first copy land before checking for duplicates
+        PostProcessor.drain()
 
     if Zotify.CONFIG.get_skip_previously_downloaded():
-        archived_tracks = get_archived_tracks_info()
-        if track_id in archived_tracks:
-            track_info = archived_tracks[track_id]
+        track_info = get_archived_track_info(track_id)
+        if track_info is not None:
             track_label = f"{track_info['artist']} - {track_info['name']}"
             Printer.hashtaged(PrintChannel.SKIPPING, f'"{track_label}" (TRACK ALREADY DOWNLOADED ONCE)')
             return
@@ -200,9 +391,11 @@ def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optio
         else:
             album_id = total_tracks = None
             try:
-                (raw, info) = Zotify.invoke_url(f'{TRACK_URL}?ids={track_id}&market=from_token')
-                album_id = info[TRACKS][0][ALBUM][ID]
-                total_tracks = info[TRACKS][0][ALBUM][TOTAL_TRACKS]
+                if track_resp is None:
+                    (raw, info) = Zotify.invoke_url(f'{TRACK_URL}?ids={track_id}&market=from_token')
+                    track_resp = info[TRACKS][0]
+                album_id = track_resp[ALBUM][ID]
+                total_tracks = track_resp[ALBUM][TOTAL_TRACKS]
             except:
                 Printer.hashtaged(PrintChannel.ERROR, 'FAILED TO FIND PARENT ALBUM\n' +\
                                                      f'Track_ID: {track_id}')
@@ -210,14 +403,17 @@ def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optio
             if album_id and total_tracks and int(total_tracks) > 1:
                 from zotify.album import download_album
                 # uses album OUTPUT template for track_path formatting, but handle m3u8 as if only this track was downloaded
-                download_album(album_id, pbar_stack, M3U8_bypass=(mode, track_id))
+                download_album(progress_emitter, album_id, pbar_stack, M3U8_bypass=(mode, track_id))
                 return
     
     if extra_keys is None:
         extra_keys = {}
     
     try:
-        track_metadata = get_track_metadata(track_id)
+        if track_resp is not None:
+            track_metadata = parse_track_metadata(track_resp)
+        else:
+            track_metadata = get_track_metadata(track_id)
         
         with Loader(PrintChannel.PROGRESS_INFO, "Preparing download..."):
             track_name = track_metadata[NAME]
@@ -237,7 +433,7 @@ def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optio
                                                         (f'Regex Groups: {regex_match.groupdict()}\n' if regex_match.groups() else ""))
                     return
             
-            output_template = Zotify.CONFIG.get_output(mode)
+            output_template = Zotify.CONFIG.get_output_template(mode)
             root_to_track, track_label = fill_output_template(output_template, track_metadata, extra_keys)
             
             track_path = PurePath(Zotify.CONFIG.get_root_path()).joinpath(root_to_track)
@@ -247,16 +443,15 @@ def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optio
             if Zotify.CONFIG.get_temp_download_dir() != '':
                 track_path_temp = PurePath(Zotify.CONFIG.get_temp_download_dir()).joinpath(f'zotify_{str(uuid.uuid4())}_{track_id}.{track_path.suffix}')
             
-            track_path_exists = Path(track_path).is_file() and Path(track_path).stat().st_size
-            in_dir_songids = track_metadata[ID] in get_directory_song_ids(filedir)
+            track_path_exists = DirectoryCache.exists(track_path)
+            in_dir_songids = in_directory_song_archive(track_metadata[ID], filedir)
             Printer.debug("Duplicate Check\n" +\
                          f"File Already Exists: {track_path_exists}\n" +\
                          f"song_id in Local Archive: {in_dir_songids}")
             
             # same track_path, not same song_id, rename the newcomer
             if track_path_exists and not in_dir_songids and not Zotify.CONFIG.get_disable_directory_archives():
-                c = len([file for file in Path(filedir).iterdir() if file.match(track_path.stem + "*")])
-                track_path = PurePath(filedir).joinpath(f'{track_path.stem}_{c}{track_path.suffix}')
+                track_path = DirectoryCache.next_free_path(track_path)
                 track_path_exists = False # new track_path guaranteed to be unique
             
             liked_m3u8 = child_request_mode == "liked" and Zotify.CONFIG.get_liked_songs_archive_m3u8()
@@ -327,6 +522,7 @@ def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optio
                         return
 
                     create_download_directory(filedir)
+                    DirectoryCache.add(track_path)
                     total_size = stream.input_stream.size
                     
                     time_start = time.time()
@@ -363,27 +559,10 @@ def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optio
                     lyrics = handle_lyrics(track_id, filedir, track_metadata)
                     
                     # no metadata is written to track prior to conversion
-                    time_elapsed_ffmpeg = convert_audio_format(track_path_temp)
-                    
-                    try:
-                        set_audio_tags(track_path_temp, track_metadata, total_discs, genres, lyrics)
-                        set_music_thumbnail(track_path_temp, track_metadata[IMAGE_URL], mode)
-                    except Exception as e:
-                        Printer.hashtaged(PrintChannel.ERROR, 'FAILED TO WRITE METADATA\n' +\
-                                                              'Ensure FFMPEG is installed and added to your PATH')
-                        Printer.traceback(e)
-                    
-                    if track_path_temp != track_path:
-                        if Path(track_path).exists():
-                            Path(track_path).unlink()
-                        Path(track_path_temp).rename(track_path)
-                    
-                    Printer.hashtaged(PrintChannel.DOWNLOADS, f'DOWNLOADED: "{PurePath(track_path).relative_to(Zotify.CONFIG.get_root_path())}"\n' +\
-                                                              f'DOWNLOAD TOOK {time_elapsed_dl} (PLUS {time_elapsed_ffmpeg} CONVERTING)')
-                    
-                    add_to_song_archive(track_metadata[ID], PurePath(track_path).name, track_metadata[ARTISTS][0], track_name)
-                    if not in_dir_songids:
-                        add_to_directory_song_archive(track_path, track_metadata[ID], track_metadata[ARTISTS][0], track_name)
+                    PostProcessor.submit(partial(postprocess_track, mode, track_path_temp, track_path, track_metadata, total_discs,
+                                                 genres, lyrics, in_dir_songids, time_elapsed_dl,
+                                                 show_loader=Zotify.CONFIG.get_postprocess_workers() == 0),
+                                         track_id, filedir)
                     
                     if Zotify.IS_RATE_LIMITED:
                         Zotify.SUCCESSFUL_DOWNLOADS_SINCE_RATE_LIMIT += 1
@@ -402,12 +581,56 @@ def download_track(progress_emitter, mode: str, track_id: str, extra_keys: Optio
             Printer.traceback(e)
             if Path(track_path_temp).exists():
                 Path(track_path_temp).unlink()
+            DirectoryCache.release(track_path)
 
 
-def convert_audio_format(track_path) -> None:
+def postprocess_track(mode: str, track_path_temp: PurePath, track_path: PurePath, track_metadata: dict, total_discs: Optional[str],
+                      genres: list[str], lyrics: Optional[list[str]], in_dir_songids: bool, time_elapsed_dl: str,
+                      show_loader: bool = True) -> Optional[Callable[[], None]]:
+    """ Converts and tags a downloaded track, returns the archive/index updates to run in download order """
+    
+    try:
+        time_elapsed_ffmpeg = convert_audio_format(track_path_temp, show_loader)
+        
+        try:
+            img = fetch_album_art(track_metadata)
+            set_audio_tags(track_path_temp, track_metadata, total_discs, genres, lyrics, img)
+            if img is not None:
+                save_album_art_jpg(track_path, img, mode)
+        except Exception as e:
+            Printer.hashtaged(PrintChannel.ERROR, 'FAILED TO WRITE METADATA\n' +\
+                                                  'Ensure FFMPEG is installed and added to your PATH')
+            Printer.traceback(e)
+        
+        if track_path_temp != track_path:
+            if Path(track_path).exists():
+                Path(track_path).unlink()
+            Path(track_path_temp).rename(track_path)
+    
+    except Exception as e:
+        Printer.hashtaged(PrintChannel.ERROR, 'SKIPPING SONG - GENERAL POST-PROCESSING ERROR\n' +\
+                                             f'Track_Name: {track_metadata[NAME]} - Track_ID: {track_metadata[ID]}')
+        Printer.traceback(e)
+        if Path(track_path_temp).exists():
+            Path(track_path_temp).unlink()
+        DirectoryCache.release(track_path)
+        return None
+    
+    def finalize() -> None:
+        Printer.hashtaged(PrintChannel.DOWNLOADS, f'DOWNLOADED: "{PurePath(track_path).relative_to(Zotify.CONFIG.get_root_path())}"\n' +\
+                                                  f'DOWNLOAD TOOK {time_elapsed_dl} (PLUS {time_elapsed_ffmpeg} CONVERTING)')
+        
+        add_to_song_archive(track_metadata[ID], PurePath(track_path).name, track_metadata[ARTISTS][0], track_metadata[NAME])
+        if not in_dir_songids:
+            add_to_directory_song_archive(track_path, track_metadata[ID], track_metadata[ARTISTS][0], track_metadata[NAME])
+    
+    return finalize
+
+
+def convert_audio_format(track_path, show_loader: bool = True) -> None:
     """ Converts raw audio into playable file """
-    temp_track_path = f'{PurePath(track_path).parent}.tmp'
-    Path(track_path).replace(temp_track_path)
+    # unique per track, several conversions may run side by side in the same directory
+    temp_track_path = str(PurePath(track_path).with_name(f'.{uuid.uuid4().hex}.tmp'))
     
     download_format = Zotify.CONFIG.get_download_format().lower()
     file_codec = CODEC_MAP.get(download_format, 'copy')
@@ -428,13 +651,14 @@ def convert_audio_format(track_path) -> None:
         output_params += ['-b:a', bitrate]
     
     time_ffmpeg_start = time.time()
+    Path(track_path).replace(temp_track_path)
     try:
         ff_m = ffmpy.FFmpeg(
             global_options=['-y', '-hide_banner', f'-loglevel {Zotify.CONFIG.get_ffmpeg_log_level()}'],
             inputs={temp_track_path: None},
             outputs={track_path: output_params}
         )
-        with Loader(PrintChannel.PROGRESS_INFO, "Converting file..."):
+        with Loader(PrintChannel.PROGRESS_INFO, "Converting file...") if show_loader else nullcontext():
             ff_m.run()
         
         if Path(temp_track_path).exists():
@@ -446,6 +670,8 @@ def convert_audio_format(track_path) -> None:
         else:
             reason = str(e) + "\n"
         Printer.hashtaged(PrintChannel.WARNING, reason + f'SKIPPING CONVERSION TO {file_codec.upper()}')
+        if Path(temp_track_path).exists():
+            Path(temp_track_path).replace(track_path)
     
     time_ffmpeg_end = time.time()
     return fmt_duration(time_ffmpeg_end - time_ffmpeg_start)
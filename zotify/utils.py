@@ -2,33 +2,29 @@ import datetime
 import os
 import re
 import subprocess
-import requests
 import music_tag
 from music_tag.file import TAG_MAP_ENTRY
 from music_tag.mp4 import freeform_set
 from mutagen.id3 import TXXX
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from time import sleep
-from typing import Union, Optional
+from typing import Any, Callable, Iterable, Iterator, Union, Optional
 from pathlib import Path, PurePath
 
-from zotify.config import Zotify
+from zotify.archive import SongArchive, LibraryIndex
+from zotify.cache import CoverArtCache
+from zotify.config import Zotify, OutputTemplate, OUTPUT_TRACK_FIELDS
 from zotify.const import ALBUMARTIST, ARTIST, TRACKTITLE, ALBUM, YEAR, DISCNUMBER, TRACKNUMBER, ARTWORK, \
-    TOTALTRACKS, TOTALDISCS, EXT_MAP, LYRICS, COMPILATION, GENRE, EXT_MAP, MP3_CUSTOM_TAG_PREFIX, M4A_CUSTOM_TAG_PREFIX
+    TOTALTRACKS, TOTALDISCS, EXT_MAP, LYRICS, COMPILATION, GENRE, EXT_MAP, MP3_CUSTOM_TAG_PREFIX, M4A_CUSTOM_TAG_PREFIX, \
+    ARTISTS, ALBUM_ARTISTS, NAME, ID
 from zotify.termoutput import PrintChannel, Printer
 
 
 # Path Utils
 def create_download_directory(dir_path: Union[str, PurePath]) -> None:
-    """ Create directory and add a hidden file with song ids """
+    """ Create directory (song ids are tracked by the library-wide index) """
     Path(dir_path).mkdir(parents=True, exist_ok=True)
-    
-    # add hidden file with song ids
-    hidden_file_path = PurePath(dir_path).joinpath('.song_ids')
-    if Zotify.CONFIG.get_disable_directory_archives():
-        return
-    if not Path(hidden_file_path).is_file():
-        with open(hidden_file_path, 'w', encoding='utf-8') as f:
-            pass
 
 
 def fix_filename(name: Union[str, PurePath, Path] ):
@@ -56,29 +52,59 @@ def fix_filename(name: Union[str, PurePath, Path] ):
     return name
 
 
-def fill_output_template(output_template: str, track_metadata: dict, extra_keys: dict) -> tuple[str, str]:
+def output_template_values(template: OutputTemplate, track_metadata: Optional[dict], extra_keys: dict) -> dict[str, str]:
+    """ Sanitizes only the fields the template uses, extra keys take precedence over track metadata """
+    values = {}
+    for field in template.fields:
+        if field in extra_keys:
+            values[field] = fix_filename(extra_keys[field])
+        elif track_metadata is not None and field in OUTPUT_TRACK_FIELDS:
+            values[field] = fix_filename(output_track_field(track_metadata, field))
+    return values
     
-    for k in extra_keys:
-        output_template = output_template.replace("{"+k+"}", fix_filename(extra_keys[k]))
     
-    (scraped_track_id, name, artists, artist_ids, release_date, release_year, track_number, total_tracks,
-     album, album_artists, disc_number, compilation, duration_ms, image_url, is_playable) = track_metadata.values()
+def output_track_field(track_metadata: dict, field: str) -> str:
+    if field == 'artist':
+        return track_metadata[ARTISTS][0]
+    elif field == 'album_artist':
+        return track_metadata[ALBUM_ARTISTS][0]
+    elif field == 'song_name':
+        return track_metadata[NAME]
+    elif field == 'release_year':
+        return track_metadata[YEAR]
+    elif field in {'id', 'track_id'}:
+        return track_metadata[ID]
+    return track_metadata[field]
+    
+
+def fill_output_template(output_template: Union[str, OutputTemplate], track_metadata: dict, extra_keys: dict) -> tuple[str, str]:
+    
+    if isinstance(output_template, str):
+        output_template = OutputTemplate.compile(output_template)
     
-    output_template = output_template.replace("{artist}", fix_filename(artists[0]))
-    output_template = output_template.replace("{album_artist}", fix_filename(album_artists[0]))
-    output_template = output_template.replace("{album}", fix_filename(album))
-    output_template = output_template.replace("{song_name}", fix_filename(name))
-    output_template = output_template.replace("{release_year}", fix_filename(release_year))
-    output_template = output_template.replace("{disc_number}", fix_filename(disc_number))
-    output_template = output_template.replace("{track_number}", fix_filename(track_number))
-    output_template = output_template.replace("{total_tracks}", fix_filename(total_tracks))
-    output_template = output_template.replace("{id}", fix_filename(scraped_track_id))
-    output_template = output_template.replace("{track_id}", fix_filename(scraped_track_id))
+    root_to_track = output_template.render(output_template_values(output_template, track_metadata, extra_keys))
     
     ext = EXT_MAP.get(Zotify.CONFIG.get_download_format().lower())
-    output_template += f".{ext}"
+    root_to_track += f".{ext}"
     
-    return output_template, fix_filename(artists[0]) + ' - ' + fix_filename(name)
+    return root_to_track, fix_filename(track_metadata[ARTISTS][0]) + ' - ' + fix_filename(track_metadata[NAME])
+
+
+def predict_output_directory(mode: str, extra_keys: dict, tracks: Iterable[tuple[dict, dict]]) -> PurePath:
+    """
+    Returns the directory, relative to the root path, that every track of a collection is written to.
+    Tracks are (track_metadata, per-track extra keys) pairs and are only consumed when the directory
+    depends on more than the collection-wide extra keys. Raises ValueError if their directories differ.
+    """
+    parent = Zotify.CONFIG.get_output_template(mode).parent()
+    if parent.fields <= set(extra_keys):
+        return PurePath(parent.render(output_template_values(parent, None, extra_keys)))
+    
+    directories = {parent.render(output_template_values(parent, track_metadata, {**extra_keys, **track_keys}))
+                   for track_metadata, track_keys in tracks}
+    if len(directories) > 1:
+        raise ValueError(f'No shared parent directory between {", ".join(f"`{d}`" for d in sorted(directories))}')
+    return PurePath(directories.pop()) if directories else PurePath()
 
 
 def walk_directory_for_tracks(path: Union[str, PurePath]) -> set[Path]:
@@ -93,6 +119,39 @@ def walk_directory_for_tracks(path: Union[str, PurePath]) -> set[Path]:
     return track_paths
 
 
+def read_files_bulk(paths: Iterable[Path], reader: Callable[[Path], Any],
+                    workers: Optional[int] = None) -> Iterator[tuple[Path, Any]]:
+    """
+    Applies reader (e.g. get_audio_tags) to each file on a thread pool and yields (path, result) in
+    input order, result being the raised exception if the read failed. At most a few reads per worker
+    are in flight, so memory stays bounded however long the input is.
+    """
+    if workers is None:
+        workers = Zotify.CONFIG.get_tag_read_workers()
+    
+    def read(path: Path) -> Any:
+        try:
+            return reader(path)
+        except Exception as e:
+            return e
+    
+    if workers <= 1:
+        for path in paths:
+            yield path, read(path)
+        return
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zotify-tags') as executor:
+        in_flight: deque[tuple[Path, Future]] = deque()
+        for path in paths:
+            in_flight.append((path, executor.submit(read, path)))
+            if len(in_flight) >= workers * 4:
+                path, future = in_flight.popleft()
+                yield path, future.result()
+        while in_flight:
+            path, future = in_flight.popleft()
+            yield path, future.result()
+
+
 # Input Processing Utils
 def regex_input_for_urls(search_input: str, non_global: bool = False) -> tuple[
     Optional[str], Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]:
@@ -163,8 +222,9 @@ def conv_genre_format(genres: list[str]) -> Union[list[str], str]:
         return Zotify.CONFIG.get_genre_delimiter().join(genres)
 
 
-def set_audio_tags(track_path: PurePath, track_metadata: dict, total_discs: Optional[str], genres: list[str], lyrics: Optional[list[str]]) -> None:
-    """ sets music_tag metadata """
+def set_audio_tags(track_path: PurePath, track_metadata: dict, total_discs: Optional[str], genres: list[str], lyrics: Optional[list[str]],
+                   image: Optional[bytes] = None) -> None:
+    """ sets music_tag metadata and album cover in a single load/save of the file """
     
     (scraped_track_id, track_name, artists, artist_ids, release_date, release_year, track_number, total_tracks,
      album, album_artists, disc_number, compilation, duration_ms, image_url, is_playable) = track_metadata.values()
@@ -208,9 +268,17 @@ def set_audio_tags(track_path: PurePath, track_metadata: dict, total_discs: Opti
         tags.set_raw("mp3", "TPOS", str(disc_number))
         tags.set_raw("mp3", "TRCK", str(track_number))
     
+    if image:
+        tags[ARTWORK] = image
+    
     tags.save()
 
 
+# names of the (reliable, unreliable) tags in the order returned by get_audio_tags
+AUDIO_TAG_NAMES = (('artists', 'genres', 'title', 'album', 'album_artists', 'year', 'disc_number', 'track_number'),
+                   ('total_tracks', 'total_discs', 'compilation', 'lyrics', 'track_id'))
+
+
 def get_audio_tags(track_path: Path) -> tuple[tuple, tuple]:
     tags = music_tag.load_file(track_path)
     
@@ -267,10 +335,17 @@ def get_audio_tags(track_path: Path) -> tuple[tuple, tuple]:
            tuple(utag_vals)
 
 
-def compare_audio_tags(track_path: Union[str, Path], reliable_tags: tuple, unreliable_tags: tuple) -> Union[list, bool]:
-    """ Compares music_tag metadata to provided metadata, returns Truthy value if discrepancy is found """
+def compare_audio_tags(track_path: Union[str, Path], reliable_tags: tuple, unreliable_tags: tuple,
+                       tags_onfile: Optional[tuple[tuple, tuple]] = None) -> Union[list, bool]:
+    """
+    Compares music_tag metadata to provided metadata, returns Truthy value if discrepancy is found.
+    Mismatches are listed as (tag name, provided value, value on file), see AUDIO_TAG_NAMES for the order.
+    The file is only read if tags_onfile (as returned by get_audio_tags) is not given.
+    """
     
-    reliable_tags_onfile, unreliable_tags_onfile = get_audio_tags(track_path)
+    if tags_onfile is None:
+        tags_onfile = get_audio_tags(track_path)
+    reliable_tags_onfile, unreliable_tags_onfile = tags_onfile
     
     mismatches = []
     
@@ -282,10 +357,10 @@ def compare_audio_tags(track_path: Union[str, Path], reliable_tags: tuple, unrel
     for i in range(len(reliable_tags)):
         if isinstance(reliable_tags[i], list) and isinstance(reliable_tags_onfile[i], list):
             if sorted(reliable_tags[i]) != sorted(reliable_tags_onfile[i]):
-                mismatches.append( (reliable_tags[i], reliable_tags_onfile[i]) )
+                mismatches.append( (AUDIO_TAG_NAMES[0][i], reliable_tags[i], reliable_tags_onfile[i]) )
         else:
             if str(reliable_tags[i]) != str(reliable_tags_onfile[i]):
-                mismatches.append( (reliable_tags[i], reliable_tags_onfile[i]) )
+                mismatches.append( (AUDIO_TAG_NAMES[0][i], reliable_tags[i], reliable_tags_onfile[i]) )
     
     if mismatches:
         return mismatches
@@ -295,32 +370,33 @@ def compare_audio_tags(track_path: Union[str, Path], reliable_tags: tuple, unrel
         if not Zotify.CONFIG.get_strict_library_verify() and not Zotify.CONFIG.debug():
             return True
     
-    # stickler check for unreliable tags
+    # stickler check for unreliable tags, skipping those the API did not provide
     for i in range(len(unreliable_tags)):
+        if unreliable_tags[i] is None:
+            continue
         if isinstance(unreliable_tags[i], list) and isinstance(unreliable_tags_onfile[i], list):
             # do not sort lyrics, since order matters
             if unreliable_tags[i] != unreliable_tags_onfile[i]:
-                mismatches.append( (unreliable_tags[i], unreliable_tags_onfile[i]) )
+                mismatches.append( (AUDIO_TAG_NAMES[1][i], unreliable_tags[i], unreliable_tags_onfile[i]) )
         else:
             if str(unreliable_tags[i]) != str(unreliable_tags_onfile[i]):
-                mismatches.append( (unreliable_tags[i], unreliable_tags_onfile[i]) )
+                mismatches.append( (AUDIO_TAG_NAMES[1][i], unreliable_tags[i], unreliable_tags_onfile[i]) )
     
     return mismatches
 
 
-def set_music_thumbnail(track_path: PurePath, image_url: str, mode: str) -> None:
-    """ Fetch an album cover image, set album cover tag, and save to file if desired """
+def get_album_art(image_url: str) -> bytes:
+    """ Fetch an album cover image (jpeg format expected from request) """
+    return CoverArtCache.get(image_url)
     
-    # jpeg format expected from request
-    img = requests.get(image_url).content
-    tags = music_tag.load_file(track_path)
-    tags[ARTWORK] = img
-    tags.save()
+
+def save_album_art_jpg(track_path: PurePath, img: bytes, mode: str) -> None:
+    """ Save an album cover image next to the track if desired """
     
     if not Zotify.CONFIG.get_album_art_jpg_file():
         return
     
-    jpg_filename = 'cover.jpg' if '{album}' in Zotify.CONFIG.get_output(mode) else track_path.stem + '.jpg'
+    jpg_filename = 'cover.jpg' if '{album}' in Zotify.CONFIG.get_output(mode) else PurePath(track_path).stem + '.jpg'
     jpg_path = Path(track_path).parent.joinpath(jpg_filename)
     
     if not jpg_path.exists():
@@ -391,91 +467,28 @@ def get_archived_entries() -> list[str]:
     return entries
 
 
-# Caches for song IDs to prevent repeated file reads
-directory_song_ids_cache = {}
-archived_tracks_info_cache = None
-
-
-def get_archived_tracks_info() -> dict[str, dict]:
-    """ Returns a dictionary of all-time downloaded track info, mapping track_id to {artist, name} """
-    global archived_tracks_info_cache
-
-    if archived_tracks_info_cache is not None:
-        return archived_tracks_info_cache
-
-    entries = get_archived_entries()
-
-    tracks_info = {}
-    for entry in entries:
-        if not entry.strip():
-            continue
-        parts = entry.strip().split('\t')
-        if len(parts) >= 4:
-            track_id = parts[0]
-            author_name = parts[2]
-            track_name = parts[3]
-            tracks_info[track_id] = {'artist': author_name, 'name': track_name}
-
-    archived_tracks_info_cache = tracks_info
-    return tracks_info
+def get_archived_track_info(track_id: str) -> Optional[dict[str, str]]:
+    """ Returns the archived {artist, name} of a previously downloaded track, or None """
+    return SongArchive.get(track_id)
 
 
 def add_to_song_archive(track_id: str, filename: str, author_name: str, track_name: str) -> None:
     """ Adds song id to all time installed songs archive """
-    global archived_tracks_info_cache
-
-    if Zotify.CONFIG.get_disable_song_archive():
-        return
-    
-    # Update cache if it's populated
-    if archived_tracks_info_cache is not None:
-        archived_tracks_info_cache[track_id] = {'artist': author_name, 'name': track_name}
-
-    archive_path = Zotify.CONFIG.get_song_archive_location()
-    if Path(archive_path).exists():
-        with open(archive_path, 'a', encoding='utf-8') as file:
-            file.write(f'{track_id}\t{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\t{author_name}\t{track_name}\t{filename}\n')
-    else:
-        with open(archive_path, 'w', encoding='utf-8') as file:
-            file.write(f'{track_id}\t{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\t{author_name}\t{track_name}\t{filename}\n')
-
-
-def get_directory_song_ids(download_path: str) -> set[str]:
-    """ Gets song ids of songs in directory """
-    global directory_song_ids_cache
-
-    abs_path = str(Path(download_path).resolve())
+    SongArchive.add(track_id, filename, author_name, track_name)
 
-    if abs_path in directory_song_ids_cache:
-        return directory_song_ids_cache[abs_path]
-
-    track_ids = set()
-    hidden_file_path = PurePath(download_path).joinpath('.song_ids')
-
-    if Path(hidden_file_path).is_file() and not Zotify.CONFIG.get_disable_directory_archives():
-        with open(hidden_file_path, 'r', encoding='utf-8') as file:
-            track_ids.update([line.strip().split('\t')[0] for line in file.readlines() if line.strip()])
     
-    directory_song_ids_cache[abs_path] = track_ids
-    return track_ids
+def in_directory_song_archive(track_id: str, download_path: Union[str, PurePath]) -> bool:
+    """ Returns True if the song id was already saved into this directory """
+    if Zotify.CONFIG.get_disable_directory_archives():
+        return False
+    return LibraryIndex.contains(track_id, PurePath(download_path))
 
 
 def add_to_directory_song_archive(track_path: PurePath, track_id: str, author_name: str, track_name: str) -> None:
-    """ Appends song_id to .song_ids file in directory """
-    global directory_song_ids_cache
-
+    """ Records the song id and file of a downloaded track in the library index """
     if Zotify.CONFIG.get_disable_directory_archives():
         return
-    
-    abs_path = str(Path(track_path.parent).resolve())
-    if abs_path in directory_song_ids_cache:
-        directory_song_ids_cache[abs_path].add(track_id)
-
-    hidden_file_path = track_path.parent / '.song_ids'
-    # not checking if file exists because we need an exception
-    # to be raised if something is wrong
-    with open(hidden_file_path, 'a', encoding='utf-8') as file:
-        file.write(f'{track_id}\t{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\t{author_name}\t{track_name}\t{track_path.name}\n')
+    LibraryIndex.add(track_path, track_id, author_name, track_name)
 
 
 # Playlist File Utils
@@ -0,0 +1,255 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path, PurePath
+from typing import Callable, Optional, Union
+
+from zotify.const import EXT_MAP
+from zotify.termoutput import Printer
+
+TRACK_SUFFIXES = tuple(f'.{ext}' for ext in set(EXT_MAP.values()))
+
+# inotify(7) event masks
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+             IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+ADDED = 'added'
+REMOVED = 'removed'
+MODIFIED = 'modified'
+
+
+def is_track_file(path: Union[str, PurePath]) -> bool:
+    name = PurePath(path).name
+    # conversions and downloads in progress use hidden or .tmp names, only the final rename counts
+    return not name.startswith('.') and name.lower().endswith(TRACK_SUFFIXES)
+
+
+def snapshot_tracks(root: Union[str, PurePath]) -> dict[Path, tuple[int, int]]:
+    """ Returns {path: (size, mtime_ns)} of every track file under root """
+    tracks = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            if is_track_file(filename):
+                path = Path(dirpath) / filename
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                tracks[path] = (st.st_size, st.st_mtime_ns)
+    return tracks
+
+
+class LibraryWatcher:
+    """
+    Watches every track file under a root directory and reports batches of (event, path) changes,
+    event being one of ADDED, REMOVED or MODIFIED.
+    
+    Uses inotify on Linux and falls back to comparing periodic snapshots elsewhere or when inotify
+    is unavailable (e.g. the watch limit is reached). Changes are debounced, so the callback runs
+    on the watcher thread once the tree has been quiet for DEBOUNCE seconds.
+    """
+    
+    DEBOUNCE = 0.5
+    POLL_INTERVAL = 5.0
+    
+    def __init__(self, root: Union[str, PurePath], on_change: Callable[[list[tuple[str, Path]]], None],
+                 known: Optional[set[Path]] = None):
+        self.root = Path(root)
+        self.on_change = on_change
+        self._known: set[Path] = set(known) if known is not None else set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: dict[Path, str] = {}
+        self.backend = None
+    
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='zotify-library-watcher', daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+    
+    def _run(self) -> None:
+        try:
+            if sys.platform.startswith('linux') and self._run_inotify():
+                return
+        except Exception as e:
+            Printer.debug(f'inotify watcher failed, polling {self.root} instead: {e}')
+        if not self._stop.is_set():
+            self._run_polling()
+    
+    def _queue(self, event: str, path: Path) -> None:
+        """ Folds a raw event into the pending batch, relative to the files known to the consumer """
+        if event == REMOVED:
+            if path in self._known:
+                self._pending[path] = REMOVED
+            else:
+                self._pending.pop(path, None)
+        else:
+            self._pending[path] = MODIFIED if path in self._known else ADDED
+    
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        changes = list(self._pending.items())
+        self._pending = {}
+        for path, event in changes:
+            if event == REMOVED:
+                self._known.discard(path)
+            else:
+                self._known.add(path)
+        try:
+            self.on_change([(event, path) for path, event in changes])
+        except Exception as e:
+            Printer.traceback(e)
+    
+    # Polling backend
+    def _run_polling(self) -> None:
+        self.backend = 'polling'
+        previous = snapshot_tracks(self.root)
+        # files that appeared or vanished before the watcher started
+        for path in previous.keys() - self._known:
+            self._queue(ADDED, path)
+        for path in self._known - previous.keys():
+            self._queue(REMOVED, path)
+        self._flush()
+        
+        while not self._stop.wait(self.POLL_INTERVAL):
+            current = snapshot_tracks(self.root)
+            for path in previous.keys() - current.keys():
+                self._queue(REMOVED, path)
+            for path, stat in current.items():
+                if previous.get(path) != stat:
+                    self._queue(ADDED, path)
+            previous = current
+            self._flush()
+    
+    # inotify backend
+    def _run_inotify(self) -> bool:
+        """ Returns False if inotify cannot be used, so the caller falls back to polling """
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            return False
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            return False
+        
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self.backend = 'inotify'
+        watches: dict[int, Path] = {}
+        
+        def add_watch(directory: Path) -> None:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+            watches[wd] = directory
+        
+        def add_tree(directory: Path, report: bool) -> None:
+            # new directories may already hold files by the time their watch exists
+            for dirpath, dirnames, filenames in os.walk(directory):
+                add_watch(Path(dirpath))
+                if report:
+                    for filename in filenames:
+                        if is_track_file(filename):
+                            self._queue(ADDED, Path(dirpath) / filename)
+        
+        try:
+            try:
+                add_tree(self.root, False)
+            except OSError:
+                os.close(fd)
+                fd = -1
+                return False
+            
+            # reconcile with the caller's view, anything changed before the watches existed
+            current = snapshot_tracks(self.root)
+            for path in current.keys() - self._known:
+                self._queue(ADDED, path)
+            for path in self._known - current.keys():
+                self._queue(REMOVED, path)
+            self._flush()
+            
+            last_event = 0.0
+            while not self._stop.is_set():
+                timeout = self.DEBOUNCE if self._pending else 1.0
+                readable, _, _ = select.select([fd], [], [], timeout)
+                if not readable:
+                    if self._pending and time.monotonic() - last_event >= self.DEBOUNCE:
+                        self._flush()
+                    continue
+                
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                last_event = time.monotonic()
+                
+                offset = 0
+                while offset < len(data):
+                    wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                    offset += EVENT_HEADER.size
+                    name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                    offset += length
+                    
+                    if mask & IN_Q_OVERFLOW:
+                        # events were dropped, rebuild the picture from disk
+                        current = snapshot_tracks(self.root)
+                        for path in current.keys():
+                            self._queue(ADDED, path)
+                        for path in self._known - current.keys():
+                            self._queue(REMOVED, path)
+                        continue
+                    directory = watches.get(wd)
+                    if directory is None:
+                        continue
+                    if mask & IN_IGNORED:
+                        watches.pop(wd, None)
+                        continue
+                    path = directory / name if name else directory
+                    
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            add_tree(path, True)
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            for known in [known for known in self._known if path in known.parents]:
+                                self._queue(REMOVED, known)
+                        continue
+                    if not name or not is_track_file(name):
+                        continue
+                    
+                    if mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._queue(REMOVED, path)
+                    elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_ATTRIB):
+                        self._queue(ADDED, path)
+            return True
+        finally:
+            if fd >= 0:
+                os.close(fd)